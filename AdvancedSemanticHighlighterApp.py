@@ -1,44 +1,310 @@
 from tkinter import *
 from tkinter.ttk import *
-from tkinter.filedialog import askopenfilename
+from tkinter.filedialog import askopenfilename, asksaveasfilename
+from tkinter.messagebox import showinfo, showerror
+from bisect import bisect_right
 from Highlighter import *
 from NLTKWordAnalysis import *
+from TermMatcher import *
+from Document import *
+from SpanIndex import *
+from TermVariants import *
+from TokenIndex import *
+from Concordance import *
+from BackgroundTasks import BackgroundTasks
+from TermSuggestions import *
+from AnnotatedExport import exportDocument
+from Instrumentation import instruments, timed
 
 DEFAULT_TAG = 'findAll'
+OVERLAY_TAG_PREFIX = 'overlay:'  # Overlay tags are named OVERLAY_TAG_PREFIX + highlighter name
+WARM_UP_DELAY = 500  # Milliseconds after the window shows before NLTK is preloaded in the background
+TAG_BATCH_SIZE = 1000  # Number of ranges passed to each Text.tag_add call
+VIEWPORT_ONLY_CHARS = 1024 * 1024  # Documents larger than this only tag the spans near the visible text
+VIEWPORT_MARGIN_LINES = 50  # Lines above and below the visible text that are tagged in viewport only mode
 
 
+# HighlightText is a Text widget that tags every occurrence of lists of terms.
+# In viewport only mode (for huge documents with many matches) the spans are kept in a SpanIndex
+# per tag, and only the spans near the visible part of the text are applied as Tk tags.
+# They are re-applied whenever the view changes, so the cost stays flat however many matches there are.
 class HighlightText(Text):
     def __init__(self, *args, **kwargs):
+        # Tk reports every change of view (scrolling, resizing, new text) through yscrollcommand
+        self.scrollCommand = kwargs.pop('yscrollcommand', None)
         Text.__init__(self, *args, **kwargs)
+        Text.configure(self, yscrollcommand=self.viewChanged)
         # Set a default tag
         self.tag_configure(DEFAULT_TAG, foreground='white', background='red')
+        self._initState()
+
+    # Sets up everything that isn't part of the Tk widget, so a headless subclass can share it
+    def _initState(self):
+        # The spans tagged so far, tag -> {term -> [(start, end)]}, so terms can be untagged without searching
+        self.termSpans = {}
+        self.lineIndex = None  # Built when needed, and thrown away when the text changes
+        self.tokenIndex = None  # Likewise
+        self.viewportOnly = False
+        self.matchInflections = False  # Match singulars, plurals and any case, rather than exactly
+        self.wholeWords = False  # Match terms as whole tokens, so "art" doesn't match in "start"
+        self.spanIndexes = {}  # Viewport only mode: tag -> SpanIndex
+        self.renderId = None
+        self.renderedRegion = None
+
+    def insert(self, *args, **kwargs):
+        self.lineIndex = None
+        self.tokenIndex = None
+        return Text.insert(self, *args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        self.lineIndex = None
+        self.tokenIndex = None
+        return Text.delete(self, *args, **kwargs)
+
+    def getLineIndex(self):
+        if self.lineIndex is None: self.lineIndex = LineIndex(self.get("1.0", "end-1c"))
+        return self.lineIndex
+
+    # What the matchers search: the text, or its TokenIndex when matching whole words.
+    # The text is only tokenized once, however many terms are then tagged.
+    def matchTarget(self):
+        if not self.wholeWords: return self.get("1.0", "end-1c")
+        if self.tokenIndex is None: self.tokenIndex = TokenIndex(self.get("1.0", "end-1c"))
+        return self.tokenIndex
 
     # Tags the items given in the textList
+    # All of the items are found in a single pass over the text and then tagged in bulk
+    @timed('highlightText.tagAllList')
     def tagAllList(self, textList, tag=DEFAULT_TAG):
-        for t in textList:
-            # print(t)
-            self.tagAll(t, tag)
+        if len(textList) == 1 and not self.matchInflections and not self.wholeWords:
+            # A single exact term (e.g. one just added) doesn't need an automaton
+            spans = {term: findTerm(self.get("1.0", "end-1c"), term) for term in textList if term}
+        else:
+            spans = self.termMatcher(textList).findAll(self.matchTarget())
+        self.tagSpans(spans, tag)
+
+    # The keyword arguments for a TermMatcher or HighlighterMatcher that matches the way this widget does
+    @property
+    def matcherOptions(self):
+        return matchOptions(self.matchInflections)
+
+    # The keyword arguments for a HighlighterMatcher (or Concordance) that matches the way this widget does
+    @property
+    def highlighterMatcherOptions(self):
+        return matchOptions(self.matchInflections, self.wholeWords)
 
-    def clearTags(self):
+    def termMatcher(self, terms):
+        if self.wholeWords: return TokenMatcher(terms, **self.matcherOptions)
+        return TermMatcher(terms, **self.matcherOptions)
+
+    # Deletes all of the tags, except those whose names start with keepPrefix
+    def clearTags(self, keepPrefix=None):
         for tag in self.tag_names():
+            if keepPrefix and tag.startswith(keepPrefix): continue
             self.tag_delete(tag)
+            self.termSpans.pop(tag, None)
+            self.spanIndexes.pop(tag, None)
 
-    def tagAll(self, text, tag=DEFAULT_TAG):
-        start = self.index("1.0")
-        end = self.index("end")
-
-        self.mark_set("matchStart", start)
-        self.mark_set("matchEnd", start)
-        self.mark_set("searchLimit", end)
+    # Removes a single tag from the whole text, but keeps its configuration
+    def clearTag(self, tag):
+        self.tag_remove(tag, "1.0", END)
+        self.termSpans.pop(tag, None)
+        self.spanIndexes.pop(tag, None)
 
-        count = IntVar()
-        while True:
-            index = self.search(text, "matchEnd", "searchLimit", count=count, regexp=False)
-            if index == "": break
-            if count.get() == 0: break  # matches zero-length strings
-            self.mark_set("matchStart", index)
-            self.mark_set("matchEnd", "%s+%sc" % (index, count.get()))
-            self.tag_add(tag, "matchStart", "matchEnd")
+    @timed('highlightText.tagAll')
+    def tagAll(self, text, tag=DEFAULT_TAG):
+        self.tagAllList([text], tag)
+
+    # Tags the spans of a term that have already been found for fromTag, or searches for the term if there are none
+    def copyTermTag(self, term, fromTag, tag):
+        spans = self.termSpans.get(fromTag, {}).get(term)
+        if spans is None:
+            self.tagAll(term, tag)
+        else:
+            self.tagSpans({term: spans}, tag)
+
+    # Removes the tag from the spans of a single term.
+    # Any other term of the same tag that overlaps those spans (e.g. "Miskatonic" inside
+    # "Miskatonic University") is re-tagged from its recorded spans.
+    def untagTerm(self, term, tag=DEFAULT_TAG):
+        tagSpans = self.termSpans.get(tag, {})
+        removed = tagSpans.pop(term, [])
+        if not removed: return
+        if self.viewportOnly:
+            # The other terms' spans are still in the index, so they are re-applied by the render
+            self.spanIndexes[tag].removeSpans(removed)
+            self.scheduleRender()
+            return
+        lineIndex = self.getLineIndex()
+        self.applyToSpans(self.tag_remove, tag, removed, lineIndex)
+        # The spans of one term are sorted and don't overlap, so their ends are sorted too
+        removedStarts = [start for start, end in removed]
+        removedEnds = [end for start, end in removed]
+        overlapping = []
+        for spans in tagSpans.values():
+            for start, end in spans:
+                i = bisect_right(removedEnds, start)
+                if i < len(removed) and removedStarts[i] < end:
+                    overlapping.append((start, end))
+        self.applyToSpans(self.tag_add, tag, overlapping, lineIndex)
+
+    # Adds the tag to every (start, end) character offset span in spans, a dict of term -> spans
+    def tagSpans(self, spans, tag=DEFAULT_TAG):
+        self.termSpans.setdefault(tag, {}).update(spans)
+        allSpans = [s for termSpans in spans.values() for s in termSpans]
+        if self.viewportOnly:
+            self.spanIndexes.setdefault(tag, SpanIndex()).addSpans(allSpans)
+            self.scheduleRender()
+        else:
+            self.applyToSpans(self.tag_add, tag, allSpans, self.getLineIndex())
+
+    # Tk accepts many ranges in one tag_add or tag_remove call, so the ranges are applied in batches
+    @timed('highlightText.applyToSpans')
+    def applyToSpans(self, tagOperation, tag, spans, lineIndex):
+        instruments.increment('highlightText.spansApplied', len(spans))
+        indices = []
+        for start, end in spans:
+            indices.append(lineIndex.index(start))
+            indices.append(lineIndex.index(end))
+        for i in range(0, len(indices), TAG_BATCH_SIZE * 2):
+            tagOperation(tag, *indices[i:i + TAG_BATCH_SIZE * 2])
+
+    # Switches viewport only mode on or off, moving the spans tagged so far to the new mode
+    def setViewportOnly(self, viewportOnly):
+        if viewportOnly == self.viewportOnly: return
+        self.viewportOnly = viewportOnly
+        self.spanIndexes = {}
+        self.renderedRegion = None
+        lineIndex = self.getLineIndex()
+        for tag, tagSpans in self.termSpans.items():
+            allSpans = [s for termSpans in tagSpans.values() for s in termSpans]
+            self.tag_remove(tag, "1.0", END)
+            if viewportOnly:
+                self.spanIndexes[tag] = SpanIndex(allSpans)
+            else:
+                self.applyToSpans(self.tag_add, tag, allSpans, lineIndex)
+        if viewportOnly: self.scheduleRender()
+
+    def viewChanged(self, first, last):
+        if self.scrollCommand: self.scrollCommand(first, last)
+        if self.viewportOnly: self.scheduleRender(force=False)
+
+    # Renders once the view has settled, rather than on every scroll step.
+    # Unless forced (because the spans have changed), nothing is done if the rendered region is the same.
+    def scheduleRender(self, force=True):
+        if force: self.renderedRegion = None
+        if self.renderId is None: self.renderId = self.after_idle(self.renderViewport)
+
+    # Applies just the spans that overlap the visible lines, plus a margin, as Tk tags
+    def renderViewport(self):
+        self.renderId = None
+        if not self.viewportOnly: return
+        lineStarts = self.getLineIndex().lineStarts
+        firstLine = max(int(self.index("@0,0").split('.')[0]) - VIEWPORT_MARGIN_LINES, 1)
+        lastLine = int(self.index("@0,%d" % self.winfo_height()).split('.')[0]) + VIEWPORT_MARGIN_LINES
+        region = (lineStarts[firstLine - 1], lineStarts[lastLine] if lastLine < len(lineStarts) else float('inf'))
+        if region == self.renderedRegion: return
+        self.renderedRegion = region
+        for tag, spanIndex in self.spanIndexes.items():
+            self.tag_remove(tag, "1.0", END)
+            self.applyToSpans(self.tag_add, tag, spanIndex.overlapping(*region), self.lineIndex)
+
+
+# A child window that shows where, and how often, each term occurs across all of the project's texts
+class ConcordanceWindow(Toplevel):
+    def __init__(self, concordance, highlighterName=None):
+        Toplevel.__init__(self)
+        self.title('Concordance' + (' - ' + highlighterName if highlighterName else ''))
+        self.concordance = concordance
+        self.tree = Treeview(self)
+        self.tree.pack(fill=BOTH, expand=True)
+        # The concordance lines are read from the documents in the background
+        self.tasks = BackgroundTasks(self)
+        self.bind('<Destroy>', lambda e: self.tasks.cancel())
+        self.unopenedDocuments = {}  # Document node -> (term, document fname)
+        failed = concordance.failedDocuments()
+        if failed:
+            failedRoot = self.tree.insert("", END, text="Documents that could not be read (%d)" % len(failed))
+            for fname, message in sorted(failed.items()):
+                self.tree.insert(failedRoot, END, text="%s: %s" % (os.path.basename(fname), message))
+        frequencies = concordance.termFrequencies(highlighterName)
+        for term, count in sorted(frequencies.items(), key=lambda item: (-item[1], item[0])):
+            termRoot = self.tree.insert("", END, text="%s (%d)" % (term, count))
+            for fname, documentCount in sorted(concordance.documentFrequencies(term).items()):
+                documentRoot = self.tree.insert(termRoot, END, text="%s (%d)" % (os.path.basename(fname), documentCount))
+                self.tree.insert(documentRoot, END, text=TREE_PLACEHOLDER)
+                self.unopenedDocuments[documentRoot] = (term, fname)
+        self.tree.bind('<<TreeviewOpen>>', self.documentOpened)
+
+    # The concordance lines for a document are only read when its node is opened.
+    # The placeholder stays until they have been read.
+    def documentOpened(self, event):
+        documentRoot = self.tree.focus()
+        if documentRoot not in self.unopenedDocuments: return
+        term, fname = self.unopenedDocuments.pop(documentRoot)
+        self.tasks.submit(lambda contexts: self.contextsRead(documentRoot, contexts),
+                          lambda: list(self.concordance.contexts(term, fname)),
+                          errback=lambda e: self.contextsRead(documentRoot, [], e))
+
+    def contextsRead(self, documentRoot, contexts, error=None):
+        if not self.tree.exists(documentRoot): return
+        self.tree.delete(*self.tree.get_children(documentRoot))
+        for documentFname, start, line in contexts:
+            self.tree.insert(documentRoot, END, text="%d: ...%s..." % (start, line))
+        if error is not None: self.tree.insert(documentRoot, END, text='Error: %s' % error)
+
+
+# A child window listing WordNet suggestions for a highlighter. The selected suggestions can be added to it.
+class SuggestionsWindow(Toplevel):
+    def __init__(self, suggestions, highlighterName, addTerm):
+        Toplevel.__init__(self)
+        self.title('Related terms - ' + highlighterName)
+        self.suggestions = suggestions
+        self.addTerm = addTerm
+        self.suggestionListBox = Listbox(self, selectmode=EXTENDED, width=80)
+        self.suggestionListBox.pack(side=TOP, fill=BOTH, expand=True)
+        for s in suggestions:
+            self.suggestionListBox.insert(END, str(s))
+        Button(self, text="Add selected terms", command=self.addSelected).pack(side=BOTTOM, padx=5, pady=5)
+
+    def addSelected(self):
+        # Delete from the end, so the indices of the other selected items don't change
+        for i in reversed(self.suggestionListBox.curselection()):
+            self.addTerm(self.suggestions[i].word)
+            self.suggestionListBox.delete(i)
+            del self.suggestions[i]
+
+
+# A child window showing the timings and counters collected by the instrumentation (see Instrumentation.py)
+class InstrumentationWindow(Toplevel):
+    def __init__(self):
+        Toplevel.__init__(self)
+        self.title('Timings')
+        self.reportText = Text(self, width=90, height=25, font=('Courier', 11))
+        self.reportText.pack(side=TOP, fill=BOTH, expand=True)
+        buttonFrame = Frame(self)
+        buttonFrame.pack(side=BOTTOM, fill=X)
+        Button(buttonFrame, text="Refresh", command=self.refresh).pack(side=LEFT, padx=5, pady=5)
+        Button(buttonFrame, text="Reset", command=self.reset).pack(side=LEFT, padx=5, pady=5)
+        Button(buttonFrame, text="Save...", command=self.save).pack(side=LEFT, padx=5, pady=5)
+        Button(buttonFrame, text="Profile next action...", command=self.profileNextAction).pack(side=LEFT, padx=5, pady=5)
+        self.refresh()
+
+    def refresh(self):
+        self.reportText.delete("1.0", END)
+        self.reportText.insert(END, instruments.report() + '\n\n' + str(analysisCache) + '\n' + str(highlighterCache))
+
+    def reset(self):
+        instruments.reset()
+        self.refresh()
+
+    def save(self):
+        fname = asksaveasfilename(parent=self, defaultextension='.json', filetypes=[('JSON', '*.json')])
+        if fname: instruments.dump(fname)
+
+    def profileNextAction(self):
+        fname = asksaveasfilename(parent=self, defaultextension='.prof', filetypes=[('Profile', '*.prof')])
+        if fname: instruments.profileNextAction(fname)
 
 
 class AdvancedSemanticHighlighterApp(Frame):
@@ -49,8 +315,19 @@ class AdvancedSemanticHighlighterApp(Frame):
         self.initUI()
 
         self.fname = None
+        self.document = None
         self.highlighterSet = None
         self.currentHighlighter = None
+        # The shared span index: highlighter name -> {term -> spans}, for the highlighters shown so far.
+        # A highlighter is only loaded and matched the first time it is shown (see getHighlighterSpans).
+        self.highlighterSpans = {}
+        self.overlayVars = {}  # Highlighter name -> BooleanVar of its overlay Checkbutton
+        self.concordance = None  # Built for the project the first time it is asked for
+        self.tasks = BackgroundTasks(self)
+
+        # Preload NLTK and WordNet once the window is up, unless ASH_NLTK_WARMUP=0
+        if os.environ.get('ASH_NLTK_WARMUP', '1') != '0':
+            self.after(WARM_UP_DELAY, startWarmUp)
 
     def initUI(self):
         # The text frame
@@ -74,6 +351,19 @@ class AdvancedSemanticHighlighterApp(Frame):
         highlightSelectionButton = Button(textButtonFrame, text="Highlight selection", command=self.highlightSelection)
         highlightSelectionButton.pack(side=LEFT, padx=5, pady=5)
 
+        # The matchInflectionsCheckbutton
+        self.matchInflectionsVar = BooleanVar(value=False)
+        matchInflectionsCheckbutton = Checkbutton(textButtonFrame, text="Match inflections and case",
+                                                  variable=self.matchInflectionsVar,
+                                                  command=self.matchOptionsToggled)
+        matchInflectionsCheckbutton.pack(side=LEFT, padx=5, pady=5)
+
+        # The wholeWordsCheckbutton
+        self.wholeWordsVar = BooleanVar(value=False)
+        wholeWordsCheckbutton = Checkbutton(textButtonFrame, text="Match whole words", variable=self.wholeWordsVar,
+                                            command=self.matchOptionsToggled)
+        wholeWordsCheckbutton.pack(side=LEFT, padx=5, pady=5)
+
         # The highlighterFrame
         highlighterFrame = Frame(self, borderwidth=2, relief=GROOVE)
         highlighterFrame.pack(side=LEFT, fill=BOTH, expand=True, padx=5, pady=5)
@@ -83,11 +373,32 @@ class AdvancedSemanticHighlighterApp(Frame):
         self.highlighterCombobox.bind("<<ComboboxSelected>>", self.comboboxSelection)
         self.highlighterCombobox.pack(side=TOP, padx=5, pady=5)
 
+        # The overlayFrame has a Checkbutton for each highlighter, to show it along with the current highlighter
+        self.overlayFrame = LabelFrame(highlighterFrame, text="Overlay")
+        self.overlayFrame.pack(side=TOP, fill=X, padx=5, pady=5)
+
         # The removeSelectedTermButton
         removeSelectedTermButton = Button(highlighterFrame, text="Remove selected term",
                                           command=self.removeSelectedTerm)
         removeSelectedTermButton.pack(side=BOTTOM, padx=5, pady=5)
 
+        # The suggestTermsButton
+        suggestTermsButton = Button(highlighterFrame, text="Suggest related terms", command=self.suggestTerms)
+        suggestTermsButton.pack(side=BOTTOM, padx=5, pady=5)
+
+        # The timingsButton, only when instrumentation is switched on
+        if instruments.enabled:
+            timingsButton = Button(highlighterFrame, text="Timings", command=InstrumentationWindow)
+            timingsButton.pack(side=BOTTOM, padx=5, pady=5)
+
+        # The exportButton
+        exportButton = Button(highlighterFrame, text="Export...", command=self.exportHighlights)
+        exportButton.pack(side=BOTTOM, padx=5, pady=5)
+
+        # The concordanceButton
+        concordanceButton = Button(highlighterFrame, text="Concordance", command=self.showConcordance)
+        concordanceButton.pack(side=BOTTOM, padx=5, pady=5)
+
         # The exploreSelectedTermButton
         exploreSelectedTermButton = Button(highlighterFrame, text="Explore selected term",
                                            command=self.exploreSelectedTerm)
@@ -106,24 +417,75 @@ class AdvancedSemanticHighlighterApp(Frame):
         except:
             return None
 
+    # Only the selectedTerm tag changes, using the spans already found for the current highlighter
     def termListBoxItemSelected(self, evt):
-        # We are going to change another control, so we have to set termListBox to DISABLED to preserve its state
-        self.termListBox.configure(state=DISABLED)
-        self.showCurrentHighlighter()
-        self.text.tagAll(self.selectedTerm, 'selectedTerm')
-        # OK - put termListBox back to NORMAL
-        self.termListBox.configure(state=NORMAL)
+        if self.currentHighlighter and self.selectedTerm:
+            self.text.clearTag('selectedTerm')
+            self.text.copyTermTag(self.selectedTerm, self.currentHighlighter.name, 'selectedTerm')
 
     def removeSelectedTerm(self):
-        if self.selectedTerm:
-            self.currentHighlighter.removeTerm(self.selectedTerm)
-            self.showCurrentHighlighter()
-            self.currentHighlighter.save()
+        term = self.selectedTerm
+        if term:
+            self.currentHighlighter.removeTermAndSave(term)
+            # Remove just this term from the Listbox and the text
+            self.termListBox.delete(self.termListBox.curselection()[0])
+            self.text.clearTag('selectedTerm')
+            self.text.untagTerm(term, self.currentHighlighter.name)
+            self.text.untagTerm(term, OVERLAY_TAG_PREFIX + self.currentHighlighter.name)
+            self.highlighterSpans.get(self.currentHighlighter.name, {}).pop(term, None)
 
     def exploreSelectedTerm(self):
         if self.selectedTerm:
             WordNetInfoWindow(self.selectedTerm)
 
+    # Exports the whole document, highlighted by the current highlighter and the overlays, as HTML and a JSON span file
+    def exportHighlights(self):
+        if not self.document or not self.currentHighlighter: return
+        htmlFname = asksaveasfilename(defaultextension='.html', filetypes=[('HTML', '*.html')],
+                                      initialfile=os.path.splitext(os.path.basename(self.fname))[0] + '.html')
+        if not htmlFname: return
+        # The export reads snapshots, so terms added or removed while it runs don't change it part way through
+        highlighters = [self.highlighterSet.getHighlighter(name).snapshot() for name in self.shownHighlighterNames()]
+        jsonFname = os.path.splitext(htmlFname)[0] + '.json'
+        # The terms are matched the same way as they are on the screen
+        self.tasks.submit(lambda result: showinfo('Export', 'Exported %s and %s' % (htmlFname, jsonFname), parent=self),
+                          exportDocument, self.document.fname, highlighters, htmlFname, jsonFname,
+                          self.text.highlighterMatcherOptions,
+                          errback=lambda e: showerror('Export', 'Export failed: %s' % e, parent=self))
+
+    # Looks up WordNet relatives of all of the current highlighter's terms in the background, then shows them.
+    # They are counted in the text the same way as the terms are highlighted.
+    def suggestTerms(self):
+        if not self.currentHighlighter: return
+        highlighter = self.currentHighlighter
+        # The suggestions are added to this highlighter, even if another one is current by then
+        self.tasks.submit(lambda suggestions: SuggestionsWindow(suggestions, highlighter.name,
+                                                                lambda word: self.addTerm(word, highlighter)),
+                          suggestRelatedTerms, highlighter.snapshot(), self.text.get("1.0", "end-1c"),
+                          SUGGESTION_THREADS, self.text.highlighterMatcherOptions)
+
+    # Brings the project's concordance up to date in the background (only changed files are rescanned),
+    # then shows it for the current highlighter
+    def showConcordance(self):
+        if not self.highlighterSet: return
+        highlighterName = self.currentHighlighter.name if self.currentHighlighter else None
+        matcherOptions = self.text.highlighterMatcherOptions
+        # The counts have to match what is highlighted, so a change of match options means a new concordance
+        errback = lambda e: showerror('Concordance', 'The concordance could not be built: %s' % e, parent=self)
+        if self.concordance is None or self.concordance.matcherOptions != matcherOptions:
+            self.tasks.submit(lambda c: self.concordanceReady(c, highlighterName), Concordance, self.directory,
+                              TEXT_PATTERN, matcherOptions, errback=errback)
+        else:
+            self.tasks.submit(lambda c: self.concordanceReady(c, highlighterName), self.concordance.refresh,
+                              errback=errback)
+
+    def concordanceReady(self, concordance, highlighterName):
+        if concordance.directory != self.directory: return  # Another project has been loaded since
+        self.concordance = concordance
+        ConcordanceWindow(concordance, highlighterName)
+
+    # Rebuilds the Listbox and all of the tags. This is only needed when the current highlighter changes.
+    @timed('app.showCurrentHighlighter')
     def showCurrentHighlighter(self):
         if self.currentHighlighter:
             # Empty the Listbox
@@ -133,7 +495,7 @@ class AdvancedSemanticHighlighterApp(Frame):
                 self.termListBox.insert(END, t)
 
             # Set up the highlighter and selectedTerm tags for the Text widget
-            self.text.clearTags()  # First, clear all existing tags
+            self.text.clearTags(keepPrefix=OVERLAY_TAG_PREFIX)  # First, clear all existing tags except the overlays
             # Add the new tag for the currentHighlighter
             self.text.tag_configure(self.currentHighlighter.name, foreground=self.currentHighlighter.foreground,
                                     background=self.currentHighlighter.background)
@@ -141,8 +503,57 @@ class AdvancedSemanticHighlighterApp(Frame):
             self.text.tag_configure('selectedTerm', foreground=self.currentHighlighter.background,
                                     background=self.currentHighlighter.foreground)
 
-            # Highlight the list of terms
-            self.text.tagAllList(self.currentHighlighter.terms, self.currentHighlighter.name)
+            # Highlight the list of terms from the shared span index, so switching doesn't search the text again
+            self.text.tagSpans(self.getHighlighterSpans(self.currentHighlighter.name), self.currentHighlighter.name)
+
+    # The names of the highlighters being shown: the current one and the checked overlays
+    def shownHighlighterNames(self):
+        names = [self.currentHighlighter.name] if self.currentHighlighter else []
+        return names + [name for name, var in self.overlayVars.items() if var.get() and name not in names]
+
+    # Returns a highlighter's spans from the shared span index. The highlighters that are shown but not yet in
+    # the index (along with this one) are loaded and matched in one combined pass; the rest aren't touched.
+    def getHighlighterSpans(self, name):
+        if name not in self.highlighterSpans:
+            names = [n for n in dict.fromkeys(self.shownHighlighterNames() + [name]) if n not in self.highlighterSpans]
+            matcher = HighlighterMatcher({n: self.highlighterSet.getHighlighter(n).terms for n in names},
+                                         **self.text.highlighterMatcherOptions)
+            self.highlighterSpans.update(matcher.findAll(self.text.matchTarget()))
+        return self.highlighterSpans[name]
+
+    # Changing how terms match means matching everything again, then re-showing the highlighter and overlays
+    def matchOptionsToggled(self):
+        self.text.matchInflections = self.matchInflectionsVar.get()
+        self.text.wholeWords = self.wholeWordsVar.get()
+        if not self.highlighterSet: return
+        self.highlighterSpans = {}
+        self.text.clearTags()
+        self.showCurrentHighlighter()
+        for name in self.overlayVars:
+            self.overlayToggled(name)
+
+    # Rebuilds the overlay Checkbuttons for the highlighters in the set
+    def showOverlays(self):
+        for child in self.overlayFrame.winfo_children():
+            child.destroy()
+        self.overlayVars = {}
+        for name in self.highlighterSet.highlighterNames:
+            self.overlayVars[name] = BooleanVar(value=False)
+            Checkbutton(self.overlayFrame, text=name, variable=self.overlayVars[name],
+                        command=lambda name=name: self.overlayToggled(name)).pack(side=TOP, anchor=W)
+
+    # An overlay's tag is added from the shared span index the first time it is shown.
+    # After that, showing and hiding it just changes the tag's colours.
+    def overlayToggled(self, name):
+        tag = OVERLAY_TAG_PREFIX + name
+        highlighter = self.highlighterSet.highlighters[name]  # Just the colours, so its terms needn't be loaded
+        if self.overlayVars[name].get():
+            if tag not in self.text.termSpans:
+                self.text.tagSpans(self.getHighlighterSpans(name), tag)
+                self.text.tag_lower(tag)  # Keep the current highlighter on top
+            self.text.tag_configure(tag, foreground=highlighter.foreground, background=highlighter.background)
+        else:
+            self.text.tag_configure(tag, foreground='', background='')
 
     def comboboxSelection(self, event):
         # Set the current Highlighter
@@ -152,25 +563,64 @@ class AdvancedSemanticHighlighterApp(Frame):
     def highlightSelection(self):
         # If there is no current highlighter OR selected text - do nothing
         try:
-            self.currentHighlighter.addTerm(self.text.selection_get())
-            self.showCurrentHighlighter()
-            self.currentHighlighter.save()
+            self.addTerm(self.text.selection_get())
         except Exception as e:
             return
 
+    # Adds a term to a highlighter, by default the current one
+    def addTerm(self, term, highlighter=None):
+        highlighter = highlighter or self.currentHighlighter
+        if highlighter.containsTerm(term): return
+        highlighter.addTermAndSave(term)
+        self.showAddedTerm(term, highlighter)
+
+    # Adds a term just added to a highlighter to the Listbox, the tags and the shared span index, wherever the
+    # highlighter is shown. A highlighter of a project that is no longer loaded isn't shown anywhere.
+    def showAddedTerm(self, term, highlighter):
+        name = highlighter.name
+        if not self.highlighterSet or self.highlighterSet.highlighters.get(name) is not highlighter: return
+        overlayTag = OVERLAY_TAG_PREFIX + name
+        if highlighter is self.currentHighlighter:
+            # Add just this term to the Listbox (in sorted position) and the text
+            self.termListBox.insert(highlighter.indexOfTerm(term), term)
+            self.text.tagAll(term, name)
+            spans = {term: self.text.termSpans[name][term]}
+        elif overlayTag in self.text.termSpans or name in self.highlighterSpans:
+            spans = self.text.termMatcher([term]).findAll(self.text.matchTarget())
+        else:
+            return
+        # Keep the shared span index, and the highlighter's overlay if it has one, up to date
+        if name in self.highlighterSpans: self.highlighterSpans[name].update(spans)
+        if overlayTag in self.text.termSpans: self.text.tagSpans(spans, overlayTag)
+
     def loadText(self):
         fname = askopenfilename(initialdir="./", title="Select file",
                                 filetypes=(("text", "*.txt"), ("all files", "*.*")))
         try:
-            with open(fname, 'r') as f:
-                lines = f.readlines()
-                for line in lines:
-                    self.text.insert(END, line)
-                self.fname = fname
-                # Create the set of Highlighters
-                self.highlighterSet = HighlighterSet(self.directory)
-                # Populate the combobox with the Highlighter names
-                self.highlighterCombobox['values'] = self.highlighterSet.highlighterNames
+            document = Document(fname)
+            # Insert the text in one go. Documents too large to show in full are shown in part.
+            text = document.head(MAX_DISPLAY_CHARS + 1)
+            truncated = len(text) > MAX_DISPLAY_CHARS
+            self.text.clearTags()
+            self.text.delete("1.0", END)
+            self.text.insert(END, text[:MAX_DISPLAY_CHARS])
+            self.text.setViewportOnly(len(text) > VIEWPORT_ONLY_CHARS)
+            self.master.title('Advanced semantic highlighter' +
+                              (' - showing the first %d characters' % MAX_DISPLAY_CHARS if truncated else ''))
+            self.document = document
+            self.fname = fname
+            # Keep WordNet analyses for this project next to its highlighters
+            openAnalysisCache(self.directory)
+            # Create the set of Highlighters
+            self.highlighterSet = HighlighterSet(self.directory)
+            self.highlighterSpans = {}
+            self.currentHighlighter = None
+            if self.concordance and self.concordance.directory != self.directory: self.concordance = None
+            self.showOverlays()
+            self.termListBox.delete(0, END)
+            # Populate the combobox with the Highlighter names
+            self.highlighterCombobox.set('')
+            self.highlighterCombobox['values'] = self.highlighterSet.highlighterNames
         except Exception as e:
             print("Text file load error: ", e)
 
@@ -0,0 +1,126 @@
+import os, json, sqlite3, threading
+from collections import OrderedDict
+
+ANALYSIS_CACHE_FILE = 'WordNetCache.sqlite'
+ANALYSIS_CACHE_SIZE = 4096  # Number of words kept in memory
+ANALYSIS_CACHE_VERSION = 3  # Change this when the analysis record changes, so old stores are ignored
+COMMIT_INTERVAL = 50  # Number of new words written to the store between commits
+
+
+# AnalysisCache memoizes word analyses. Analyses are plain dicts (e.g. synonyms, hypernyms,
+# hyponyms and definitions of a word) so they can be stored as JSON.
+# There is always an in-process LRU, and optionally a persistent sqlite store in a project
+# directory, next to the .hil files, so that analyses survive restarts.
+# It is safe to use from several threads. The analysis itself runs outside the lock.
+# Subclasses can keep records in memory as something more compact than dicts, by overriding
+# encode and decode, which convert a record to and from what is stored as JSON.
+class AnalysisCache:
+    def __init__(self, directory=None, maxsize=ANALYSIS_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.RLock()
+        self.connection = None
+        self.fname = None
+        self.uncommitted = 0
+        self.hits = 0
+        self.misses = 0
+        if directory: self.open(directory)
+
+    # Opens (or creates) the persistent store in directory, replacing any open store
+    def open(self, directory):
+        fname = os.path.join(directory, ANALYSIS_CACHE_FILE)
+        with self.lock:
+            if fname == self.fname: return
+            self.close()
+            try:
+                self.connection = sqlite3.connect(fname, check_same_thread=False)
+                self.connection.execute('CREATE TABLE IF NOT EXISTS analysis_v%d '
+                                        '(word TEXT PRIMARY KEY, record TEXT)' % ANALYSIS_CACHE_VERSION)
+                self.fname = fname
+            except sqlite3.Error as e:
+                print("Analysis cache open error: ", e)
+                self.connection = None
+
+    def close(self):
+        with self.lock:
+            if self.connection:
+                try:
+                    self.connection.commit()
+                    self.connection.close()
+                except sqlite3.Error as e:
+                    print("Analysis cache close error: ", e)
+            self.connection = None
+            self.fname = None
+            self.uncommitted = 0
+
+    # Returns the analysis of word, calling analyze(word) only if it isn't in memory or in the store
+    def get(self, word, analyze):
+        record = self.lookup(word)
+        if record is None:
+            record = analyze(word)
+            self.put(word, record)
+        return record
+
+    # Returns the cached analysis of word, or None
+    def lookup(self, word):
+        with self.lock:
+            record = self.entries.get(word)
+            if record is not None:
+                self.entries.move_to_end(word)
+                self.hits += 1
+                return record
+            if self.connection:
+                try:
+                    row = self.connection.execute('SELECT record FROM analysis_v%d WHERE word = ?'
+                                                  % ANALYSIS_CACHE_VERSION, (word,)).fetchone()
+                except sqlite3.Error as e:
+                    print("Analysis cache read error: ", e)
+                    row = None
+                if row:
+                    record = self.decode(json.loads(row[0]))
+                    self.remember(word, record)
+                    self.hits += 1
+                    return record
+            self.misses += 1
+            return None
+
+    def put(self, word, record):
+        with self.lock:
+            self.remember(word, record)
+            if self.connection:
+                try:
+                    self.connection.execute('INSERT OR REPLACE INTO analysis_v%d VALUES (?, ?)'
+                                            % ANALYSIS_CACHE_VERSION, (word, json.dumps(self.encode(record))))
+                    self.uncommitted += 1
+                    if self.uncommitted >= COMMIT_INTERVAL:
+                        self.connection.commit()
+                        self.uncommitted = 0
+                except sqlite3.Error as e:
+                    print("Analysis cache write error: ", e)
+
+    # Converts a record into something json.dumps can store
+    def encode(self, record):
+        return record
+
+    # Converts what json.loads gives back into a record
+    def decode(self, data):
+        return data
+
+    # Adds a record to the in-memory LRU, evicting the least recently used if it is full
+    def remember(self, word, record):
+        self.entries[word] = record
+        self.entries.move_to_end(word)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    # Empties the in-memory LRU. The persistent store is left alone.
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __contains__(self, word):
+        return self.lookup(word) is not None
+
+    def __str__(self):
+        return "Class AnalysisCache fname: %s, words in memory: %d, hits: %d, misses: %d" % \
+               (self.fname, len(self.entries), self.hits, self.misses)
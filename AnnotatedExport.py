@@ -0,0 +1,177 @@
+import os, sys, json, argparse
+from heapq import heappush, heappop
+from html import escape
+from Highlighter import *
+from TermMatcher import HighlighterMatcher
+from TermVariants import matchOptions
+from Document import Document
+
+# Exports a document highlighted by one or more Highlighters as HTML, with the highlighters' colours,
+# and as a JSON file of spans. Both are made by a pipeline of generators over the document's chunks:
+#
+#   iterMatchEvents  - the text, and the matches in order of start, as soon as no earlier match can turn up
+#   iterSegments     - the text split into runs covered by the same highlighters
+#   iterHTML/iterJSON - the output, a piece at a time
+#
+# Matches are held back for at most a chunk plus the longest term, so however large the document is,
+# only about a chunk of it is in memory and the marked up text is never built as one string.
+#
+# Usage: python3 AnnotatedExport.py document.txt projectDirectory [--html out.html] [--json out.json]
+#                                   [-H highlighter ...] [-i] [-w]
+
+TEXT, MATCH, SAFE = 'text', 'match', 'safe'  # The kinds of event generated by iterMatchEvents
+
+
+# Generates the events of a document for a HighlighterMatcher, in order:
+#   (TEXT, chunk)                         each chunk of the document
+#   (MATCH, (start, end, name, term))     each match of each highlighter, in order of start
+#   (SAFE, offset)                        no later match starts at or before offset
+def iterMatchEvents(chunks, matcher):
+    lag = matcher.markLag
+    received = []  # Chunks read by the matcher that haven't been generated yet
+
+    def readChunks():
+        for chunk in chunks:
+            received.append(chunk)
+            yield chunk
+
+    pending = []  # Heap of matches that may still have an earlier match come after them
+    for start, end, term, names in matcher.iterChunkMatches(readChunks(), markChunks=True):
+        if term is not None:
+            for name in names:
+                heappush(pending, (start, end, name, term))
+            continue
+        # The end of a chunk: every match starting at or before offset - lag is now known
+        for chunk in received:
+            yield TEXT, chunk
+        received.clear()
+        safe = start - lag
+        while pending and pending[0][0] <= safe:
+            yield MATCH, heappop(pending)
+        yield SAFE, safe
+    while pending:
+        yield MATCH, heappop(pending)
+    yield SAFE, float('inf')
+
+
+# Generates (text, names, terms) runs that cover the whole document, where names are the highlighters
+# (in highlighterNames order) and terms the (name, term) pairs whose matches cover that text
+def iterSegments(events, highlighterNames):
+    order = {name: i for i, name in enumerate(highlighterNames)}
+    buffered, bufferStart = '', 0  # Text that hasn't been generated yet, and its offset
+    position = 0
+    starts = []  # Matches up to the safe offset, in order of start
+    active = []  # Heap of (end, name, term) of the matches covering position
+    for kind, value in events:
+        if kind == TEXT:
+            buffered += value
+        elif kind == MATCH:
+            starts.append(value)
+        else:
+            limit = min(value, bufferStart + len(buffered))
+            taken = 0
+            while position < limit:
+                while taken < len(starts) and starts[taken][0] <= position:
+                    start, end, name, term = starts[taken]
+                    if end > position: heappush(active, (end, name, term))
+                    taken += 1
+                while active and active[0][0] <= position:
+                    heappop(active)
+                boundary = limit
+                if taken < len(starts): boundary = min(boundary, starts[taken][0])
+                if active: boundary = min(boundary, active[0][0])
+                text = buffered[position - bufferStart:boundary - bufferStart]
+                terms = sorted(set((name, term) for end, name, term in active), key=lambda nt: (order[nt[0]], nt[1]))
+                names = sorted(set(name for name, term in terms), key=order.get)
+                yield text, names, terms
+                position = boundary
+            del starts[:taken]
+            buffered, bufferStart = buffered[position - bufferStart:], position
+
+
+# CSS accepts most Tk colour names, but not with spaces (e.g. "light blue")
+def cssColor(color):
+    return (color or '').replace(' ', '')
+
+
+# Generates an HTML page, a piece at a time. Each highlighter has a CSS class with its colours.
+def iterHTML(segments, highlighters, title=''):
+    classes = {h.name: 'h%d' % i for i, h in enumerate(highlighters)}
+    yield '<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n<title>%s</title>\n<style>\n' % escape(title)
+    yield 'pre { white-space: pre-wrap; }\n'
+    for h in highlighters:
+        yield '.%s { color: %s; background-color: %s; }\n' % (classes[h.name], cssColor(h.foreground), cssColor(h.background))
+    yield '</style>\n</head>\n<body>\n<p>'
+    yield ' '.join('<span class="%s">%s</span>' % (classes[h.name], escape(h.name)) for h in highlighters)
+    yield '</p>\n<pre>'
+    for text, names, terms in segments:
+        if not names:
+            yield escape(text)
+        else:
+            yield '<span class="%s" title="%s">%s</span>' % (' '.join(classes[n] for n in names),
+                                                            escape('; '.join('%s: %s' % nt for nt in terms)), escape(text))
+    yield '</pre>\n</body>\n</html>\n'
+
+
+# Generates a JSON document of the spans, a piece at a time, one span per line:
+# {"document": ..., "highlighters": {name: {"foreground": ..., "background": ...}},
+#  "spans": [{"highlighter": "Term", "term": "Miskatonic University", "start": 37, "end": 58}, ...]}
+def iterJSON(events, highlighters, document=''):
+    colors = {h.name: {'foreground': h.foreground, 'background': h.background} for h in highlighters}
+    yield '{"document": %s,\n "highlighters": %s,\n "spans": [' % (json.dumps(document), json.dumps(colors))
+    separator = '\n  '
+    for kind, value in events:
+        if kind != MATCH: continue
+        start, end, name, term = value
+        yield separator + json.dumps({'highlighter': name, 'term': term, 'start': start, 'end': end})
+        separator = ',\n  '
+    yield '\n ]}\n'
+
+
+# matcherOptions are the keyword arguments of HighlighterMatcher, e.g. from matchOptions
+def makeMatcher(highlighters, matcherOptions=None):
+    return HighlighterMatcher({h.name: h.terms for h in highlighters}, **(matcherOptions or {}))
+
+
+def writePieces(pieces, fname):
+    with open(fname, 'w', encoding='utf-8') as f:
+        for piece in pieces:
+            f.write(piece)
+
+
+# Writes the HTML and/or JSON export of a document. Each is a separate pass over the document.
+def exportDocument(fname, highlighters, htmlFname=None, jsonFname=None, matcherOptions=None):
+    matcher = makeMatcher(highlighters, matcherOptions)
+    names = [h.name for h in highlighters]
+    if htmlFname:
+        events = iterMatchEvents(Document(fname).iterChunks(), matcher)
+        writePieces(iterHTML(iterSegments(events, names), highlighters, os.path.basename(fname)), htmlFname)
+    if jsonFname:
+        events = iterMatchEvents(Document(fname).iterChunks(), matcher)
+        writePieces(iterJSON(events, highlighters, os.path.basename(fname)), jsonFname)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Export a document highlighted by a project\'s highlighters.')
+    parser.add_argument('document', help='text file to export')
+    parser.add_argument('directory', help='project directory containing the ' + HIGHLIGHTER_EXT + ' files')
+    parser.add_argument('--html', help='HTML file to write')
+    parser.add_argument('--json', help='JSON span file to write')
+    parser.add_argument('-H', '--highlighters', nargs='*', help='the highlighters to use (default: all)')
+    parser.add_argument('-i', '--inflections', action='store_true',
+                        help='also match singulars and plurals of the terms, ignoring case')
+    parser.add_argument('-w', '--whole-words', action='store_true', help='match terms as whole words')
+    args = parser.parse_args(argv)
+
+    highlighterSet = HighlighterSet(args.directory)
+    names = args.highlighters or sorted(highlighterSet.highlighterNames)
+    highlighters = [highlighterSet.getHighlighter(name) for name in names]
+    base = os.path.splitext(args.document)[0]
+    htmlFname, jsonFname = args.html, args.json
+    if not htmlFname and not jsonFname: htmlFname, jsonFname = base + '.html', base + '.json'
+    exportDocument(args.document, highlighters, htmlFname, jsonFname, matchOptions(args.inflections, args.whole_words))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,73 @@
+import queue, threading
+from concurrent.futures import ThreadPoolExecutor
+
+WORKER_THREADS = 4
+POLL_INTERVAL = 50  # Milliseconds between checks for finished tasks
+
+# The worker pool is shared by every window, so several windows can be resolving at once
+executor = None
+executorLock = threading.Lock()
+
+
+def getExecutor():
+    global executor
+    with executorLock:
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=WORKER_THREADS, thread_name_prefix='BackgroundTask')
+        return executor
+
+
+# BackgroundTasks runs slow work (e.g. WordNet lookups) on the worker pool, off the Tk main loop.
+# Tk may only be used from its own thread, so finished tasks are put on a queue, and the queue is
+# polled with after() on the Tk thread, where the callbacks are run.
+# cancel() drops everything outstanding, e.g. when the widget's window is closed.
+class BackgroundTasks:
+    def __init__(self, widget):
+        self.widget = widget
+        self.finished = queue.Queue()
+        self.futures = set()
+        self.pollId = None
+        self.cancelled = False
+
+    # Runs f(*args) in the background, then callback(result) on the Tk thread.
+    # If f raises, errback(exception) is called instead.
+    def submit(self, callback, f, *args, errback=None):
+        if self.cancelled: return None
+        future = getExecutor().submit(f, *args)
+        self.futures.add(future)
+        future.add_done_callback(lambda done: self.finished.put((done, callback, errback)))
+        if self.pollId is None:
+            self.pollId = self.widget.after(POLL_INTERVAL, self.poll)
+        return future
+
+    def poll(self):
+        self.pollId = None
+        while True:
+            try:
+                future, callback, errback = self.finished.get_nowait()
+            except queue.Empty:
+                break
+            self.futures.discard(future)
+            if self.cancelled or future.cancelled(): continue
+            e = future.exception()
+            if e is None:
+                callback(future.result())
+            elif errback:
+                errback(e)
+            else:
+                print("Background task error: ", e)
+        if self.futures and not self.cancelled:
+            self.pollId = self.widget.after(POLL_INTERVAL, self.poll)
+
+    # Tasks that haven't started are cancelled. Tasks that are running finish, but their results are ignored.
+    def cancel(self):
+        self.cancelled = True
+        for future in self.futures:
+            future.cancel()
+        self.futures.clear()
+        if self.pollId is not None:
+            try:
+                self.widget.after_cancel(self.pollId)
+            except Exception:
+                pass  # The widget has already been destroyed
+            self.pollId = None
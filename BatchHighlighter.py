@@ -0,0 +1,91 @@
+import os, sys, glob, json, argparse
+from multiprocessing import Pool
+from Highlighter import *
+from TermMatcher import HighlighterMatcher
+from TermVariants import matchOptions
+from Document import Document
+
+# Applies a project's HighlighterSet to every text in the project directory, without Tk.
+# Writes one JSON line per document, as each document finishes:
+#   {"document": "OLASVisionStatement.txt",
+#    "matches": [{"highlighter": "Term", "term": "Miskatonic University", "start": 37, "end": 58}, ...]}
+# start and end are character offsets into the document.
+# A document that can't be read (e.g. it isn't in the encoding given) gets a line with the error instead:
+#   {"document": "Notes.txt", "error": "UnicodeDecodeError: 'utf-8' codec can't decode byte ..."}
+# and the other documents are still highlighted. The exit status is then 1.
+#
+# Usage: python3 BatchHighlighter.py projectDirectory [-o report.jsonl] [-j jobs] [-i] [-e encoding]
+
+TEXT_PATTERN = '*.txt'
+
+# Each worker process builds the matcher once, in initWorker, and reuses it for every document
+workerMatcher = None
+workerEncoding = None
+
+
+# highlighterTerms is a dict of highlighter name -> terms.
+# All of the highlighters share one matcher, so each document is scanned once.
+def initWorker(highlighterTerms, matchInflections=False, encoding=None):
+    global workerMatcher, workerEncoding
+    workerMatcher = HighlighterMatcher(highlighterTerms, **matchOptions(matchInflections))
+    workerEncoding = encoding
+
+
+# The document is read and matched a chunk at a time, so it can be larger than memory
+def highlightDocument(fname):
+    matches = []
+    try:
+        chunks = Document(fname, encoding=workerEncoding).iterChunks()
+        for start, end, term, names in workerMatcher.iterChunkMatches(chunks):
+            for name in names:
+                matches.append({'highlighter': name, 'term': term, 'start': start, 'end': end})
+    except (OSError, ValueError) as e:  # UnicodeDecodeError is a ValueError
+        return {'document': fname, 'error': '%s: %s' % (type(e).__name__, e)}
+    matches.sort(key=lambda m: (m['start'], m['end']))
+    return {'document': fname, 'matches': matches}
+
+
+# Generates the report for each document in directory, in the order they finish
+def highlightProject(directory, jobs=None, pattern=TEXT_PATTERN, matchInflections=False, encoding=None):
+    highlighterSet = HighlighterSet(directory)
+    highlighterTerms = {name: list(highlighterSet.getHighlighter(name).terms)
+                        for name in highlighterSet.highlighterNames}
+    files = sorted(glob.glob(os.path.join(directory, pattern)))
+    if jobs == 1:
+        initWorker(highlighterTerms, matchInflections, encoding)
+        for fname in files:
+            yield highlightDocument(fname)
+    else:
+        with Pool(jobs, initializer=initWorker, initargs=(highlighterTerms, matchInflections, encoding)) as pool:
+            for report in pool.imap_unordered(highlightDocument, files):
+                yield report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Apply the highlighters in a project directory to all of its texts.')
+    parser.add_argument('directory', help='project directory containing the ' + HIGHLIGHTER_EXT + ' and text files')
+    parser.add_argument('-o', '--output', help='JSON Lines report file (default: standard output)')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='worker processes (default: one per CPU)')
+    parser.add_argument('-p', '--pattern', default=TEXT_PATTERN, help='text file pattern (default: %(default)s)')
+    parser.add_argument('-i', '--inflections', action='store_true',
+                        help='also match singulars and plurals of the terms, ignoring case')
+    parser.add_argument('-e', '--encoding', default=None,
+                        help='encoding of the text files (default: the locale\'s, normally UTF-8)')
+    args = parser.parse_args(argv)
+
+    errors = 0
+    out = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        for report in highlightProject(args.directory, args.jobs, args.pattern, args.inflections, args.encoding):
+            report['document'] = os.path.relpath(report['document'], args.directory)
+            if 'error' in report: errors += 1
+            out.write(json.dumps(report) + '\n')
+            out.flush()  # Stream each document as soon as it is done
+    finally:
+        if out is not sys.stdout: out.close()
+    if errors: print("%d document(s) could not be highlighted" % errors, file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,177 @@
+import os, glob, threading
+from Highlighter import *
+from TermMatcher import HighlighterMatcher
+from Document import Document
+
+TEXT_PATTERN = '*.txt'
+CONTEXT_WIDTH = 40  # Characters either side of a match in a concordance line
+
+
+# A Concordance is an inverted index over every document in a project directory.
+# It maps each term of each highlighter to its postings: the documents it occurs in and
+# the (start, end) offsets of each occurrence. Queries are dictionary lookups, so they never rescan files.
+# refresh() brings it up to date incrementally: only documents that have changed are rescanned,
+# and terms added to a highlighter are matched across the documents on their own.
+# matcherOptions are the keyword arguments of HighlighterMatcher (variants, foldCase, wholeWords), so the
+# concordance can match terms the same way the text is highlighted.
+# Documents that can't be read (e.g. they aren't in the expected encoding) are left out, and listed by
+# failedDocuments. They are tried again once they change.
+class Concordance:
+    def __init__(self, directory, pattern=TEXT_PATTERN, matcherOptions=None):
+        self.directory = directory
+        self.pattern = pattern
+        self.matcherOptions = matcherOptions or {}
+        self.lock = threading.RLock()
+        self.postings = {}  # term -> {document fname -> [(start, end)]}
+        self.documentSignatures = {}  # document fname -> (mtime, size) when it was indexed
+        self.highlighterTerms = {}  # highlighter name -> sorted terms
+        self.termHighlighters = {}  # term -> highlighter names
+        self.errors = {}  # document fname -> (signature, error message) of the documents that couldn't be read
+        self.refresh()
+
+    def refresh(self):
+        with self.lock:
+            self.forgetMissingDocuments()
+            self.refreshHighlighters()
+            self.refreshDocuments()
+        return self
+
+    def forgetMissingDocuments(self):
+        for fname in [f for f in list(self.documentSignatures) + list(self.errors) if not os.path.exists(f)]:
+            self.forgetDocument(fname)
+
+    # Picks up terms added to or removed from the project's highlighters
+    def refreshHighlighters(self):
+        highlighterSet = HighlighterSet(self.directory)
+        highlighterTerms = {}
+        for name in highlighterSet.highlighterNames:
+            h = highlighterSet.getHighlighter(name)
+            with h.journal.lock:  # The user may be editing it
+                highlighterTerms[name] = list(h.terms)
+        termHighlighters = {}
+        for name, terms in highlighterTerms.items():
+            for term in terms:
+                if term: termHighlighters.setdefault(term, []).append(name)
+        newTerms = set(termHighlighters).difference(self.termHighlighters)
+        newPostings = {term: {} for term in newTerms}
+        if newTerms and self.documentSignatures:
+            # Match just the new terms across the documents that are already indexed
+            matcher = HighlighterMatcher({'new': newTerms}, **self.matcherOptions)
+            for fname in list(self.documentSignatures):
+                try:
+                    self.indexDocument(fname, matcher, newPostings)
+                except (OSError, ValueError):
+                    # It has gone or changed since. refreshDocuments indexes it again if it can.
+                    self.forgetDocument(fname)
+                    for documents in newPostings.values():
+                        documents.pop(fname, None)
+        # Everything has been matched, so the index can be updated all at once
+        for term in set(self.termHighlighters).difference(termHighlighters):
+            self.postings.pop(term, None)
+        self.postings.update(newPostings)
+        self.highlighterTerms = highlighterTerms
+        self.termHighlighters = termHighlighters
+
+    # Rescans documents that are new or have changed, and forgets documents that have gone
+    def refreshDocuments(self):
+        files = set(glob.glob(os.path.join(self.directory, self.pattern)))
+        for fname in set(self.documentSignatures).union(self.errors).difference(files):
+            self.forgetDocument(fname)
+        matcher = None
+        for fname in sorted(files):
+            try:
+                st = os.stat(fname)
+            except OSError:  # It has gone since the glob
+                self.forgetDocument(fname)
+                continue
+            signature = (st.st_mtime_ns, st.st_size)
+            if self.documentSignatures.get(fname) == signature: continue
+            if self.errors.get(fname, (None,))[0] == signature: continue  # It still can't be read
+            if matcher is None: matcher = HighlighterMatcher(self.highlighterTerms, **self.matcherOptions)
+            self.forgetDocument(fname)
+            try:
+                self.indexDocument(fname, matcher)
+            except (OSError, ValueError) as e:  # UnicodeDecodeError is a ValueError
+                self.errors[fname] = (signature, '%s: %s' % (type(e).__name__, e))
+                continue
+            self.documentSignatures[fname] = signature
+
+    # Adds the matches in a document to postings (by default, the concordance's own).
+    # If the document can't be read, postings are left as they were.
+    def indexDocument(self, fname, matcher, postings=None):
+        if postings is None: postings = self.postings
+        documentPostings = {}  # term -> spans in this document
+        for start, end, term, names in matcher.iterChunkMatches(Document(fname).iterChunks()):
+            documentPostings.setdefault(term, []).append((start, end))
+        for term, spans in documentPostings.items():
+            postings.setdefault(term, {})[fname] = spans
+
+    def forgetDocument(self, fname):
+        self.documentSignatures.pop(fname, None)
+        self.errors.pop(fname, None)
+        for documents in self.postings.values():
+            documents.pop(fname, None)
+
+    # Returns a dict of document fname -> [(start, end)] for every occurrence of term
+    def occurrences(self, term):
+        return self.postings.get(term, {})
+
+    # The number of times term occurs in the project
+    def frequency(self, term):
+        return sum(len(spans) for spans in self.occurrences(term).values())
+
+    # Returns a dict of document fname -> the number of times term occurs in it
+    def documentFrequencies(self, term):
+        return {fname: len(spans) for fname, spans in self.occurrences(term).items()}
+
+    # Returns a dict of term -> frequency, for the terms of one highlighter or of all of them
+    def termFrequencies(self, highlighterName=None):
+        terms = self.highlighterTerms.get(highlighterName, []) if highlighterName else self.postings.keys()
+        return {term: self.frequency(term) for term in terms}
+
+    def documents(self):
+        return sorted(self.documentSignatures.keys())
+
+    # Returns a dict of document fname -> error message, for the documents that couldn't be read
+    def failedDocuments(self):
+        return {fname: message for fname, (signature, message) in self.errors.items()}
+
+    # Generates (document fname, start, concordance line) for each occurrence of term, in document order.
+    # Only the documents the term occurs in are read - or just one, if fname is given - and each is read a chunk
+    # at a time, only as far as its last occurrence of the term.
+    def contexts(self, term, fname=None, width=CONTEXT_WIDTH):
+        with self.lock:  # It may be being refreshed in the background
+            occurrences = {f: list(spans) for f, spans in self.occurrences(term).items()}
+        if fname: occurrences = {fname: occurrences.get(fname, [])}
+        for fname, spans in sorted(occurrences.items()):
+            if not spans: continue
+            windows = [(max(start - width, 0), end + width) for start, end in spans]
+            for (start, end), line in zip(spans, iterWindows(Document(fname).iterChunks(), windows)):
+                yield fname, start, line.replace('\n', ' ')
+
+    def __str__(self):
+        return "Class Concordance directory: %s, documents: %d, terms: %d" % \
+               (self.directory, len(self.documentSignatures), len(self.postings))
+
+
+# Generates the text of each (start, end) window of a document given as a sequence of chunks.
+# The windows must be in order of start. Text before the current window is dropped as it is read.
+def iterWindows(chunks, windows):
+    chunks = iter(chunks)
+    buffered, bufferStart = '', 0  # The text read so far that the windows may still need, and its offset
+    for start, end in windows:
+        while True:
+            drop = min(max(start - bufferStart, 0), len(buffered))
+            buffered, bufferStart = buffered[drop:], bufferStart + drop
+            if bufferStart + len(buffered) >= end: break
+            chunk = next(chunks, None)
+            if chunk is None: break
+            buffered += chunk
+        yield buffered[start - bufferStart:end - bufferStart]
+
+if __name__ == '__main__':
+    TESTProjectDir = os.path.join(os.getcwd(), 'TESTProject')
+    concordance = Concordance(TESTProjectDir)
+    print(concordance)
+    for term, count in sorted(concordance.termFrequencies().items(), key=lambda item: -item[1]):
+        print("%5d  %s" % (count, term))
@@ -0,0 +1,48 @@
+import os
+
+DOCUMENT_CHUNK_SIZE = 1024 * 1024  # Characters read at a time
+MAX_DISPLAY_CHARS = 5 * 1024 * 1024  # Larger documents are only shown in part
+
+
+# A Document is a text file that is read a chunk at a time, so even very large texts
+# never have to be held in memory at once.
+# Character offsets are the same as for open(fname).read(): newlines are translated to '\n',
+# just as they are in the Text widget.
+class Document:
+    def __init__(self, fname, chunkSize=DOCUMENT_CHUNK_SIZE, encoding=None):
+        self.fname = fname
+        self.chunkSize = chunkSize
+        self.encoding = encoding
+        self.size = os.path.getsize(fname)  # In bytes
+
+    # Generates the text of the document, chunkSize characters at a time
+    def iterChunks(self):
+        with open(self.fname, 'r', encoding=self.encoding) as f:
+            while True:
+                chunk = f.read(self.chunkSize)
+                if not chunk: break
+                yield chunk
+
+    # Returns the first maxChars characters of the document, e.g. to show it
+    def head(self, maxChars=MAX_DISPLAY_CHARS):
+        with open(self.fname, 'r', encoding=self.encoding) as f:
+            return f.read(maxChars)
+
+    # Returns the whole text. Only use this for documents that are known to be small.
+    def read(self):
+        with open(self.fname, 'r', encoding=self.encoding) as f:
+            return f.read()
+
+    # Generates (start, end, term) for every match of a TermMatcher over the whole document
+    def iterMatches(self, matcher):
+        return matcher.iterChunkMatches(self.iterChunks())
+
+    # Returns a dict of term -> list of (start, end) spans over the whole document
+    def findAll(self, matcher):
+        spans = {t: [] for t in matcher.terms}
+        for start, end, term in self.iterMatches(matcher):
+            spans[term].append((start, end))
+        return spans
+
+    def __str__(self):
+        return "Class Document fname: %s, size: %d bytes" % (self.fname, self.size)
@@ -0,0 +1,212 @@
+import os, sys, glob, json, argparse, threading
+from concurrent.futures import ProcessPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from Highlighter import *
+from TermMatcher import HighlighterMatcher
+from TermVariants import matchOptions
+from Instrumentation import timed
+
+# A local HTTP/JSON service that highlights texts with a project's highlighters, without Tk.
+# Projects are directories of .hil files under the service's root directory.
+#
+#   POST /highlight
+#   {"project": "TESTProject", "documents": ["text...", {"id": "b", "text": "..."}],
+#    "options": {"inflections": false, "wholeWords": false}}
+#   -> {"results": [{"id": 0, "matches": [{"highlighter": "Term", "term": "Miskatonic University",
+#                                           "start": 37, "end": 58}, ...]}, ...]}
+#
+#   GET /health -> {"status": "ok"}
+#   GET /projects -> {"projects": {"TESTProject": ["Resource", "Term", ...]}} for the projects matched so far
+#
+# The compiled matchers are kept in memory, one per project and options, and rebuilt when any of the
+# project's .hil files (or their journals) change. The documents of a request are split into batches that
+# are matched by a pool of worker processes, each keeping its own matchers.
+#
+# Usage: python3 HighlightService.py root [--host 127.0.0.1] [--port 8642] [-j jobs]
+
+DEFAULT_HOST = '127.0.0.1'  # Only local clients
+DEFAULT_PORT = 8642
+DOCUMENTS_PER_TASK = 8  # The most documents sent to a worker at a time
+MAX_REQUEST_BYTES = 64 * 1024 * 1024
+
+# (project directory, options) -> (project signature, HighlighterMatcher). Each worker process has its own.
+matcherCache = {}
+matcherCacheLock = threading.Lock()
+
+
+class ServiceError(Exception):
+    def __init__(self, message, status=400):
+        Exception.__init__(self, message)
+        self.status = status
+
+
+# The file names and signatures of a project's highlighters. It changes whenever any of them is edited.
+def projectSignature(directory):
+    files = sorted(glob.glob(os.path.join(directory, '*' + HIGHLIGHTER_EXT)))
+    return tuple((f, highlighterCache.signature(f)) for f in files)
+
+
+# options is a tuple of (inflections, wholeWords)
+def getMatcher(directory, signature, options):
+    with matcherCacheLock:
+        entry = matcherCache.get((directory, options))
+        if entry and entry[0] == signature: return entry[1]
+        highlighterSet = HighlighterSet(directory)
+        highlighterTerms = {name: list(highlighterSet.getHighlighter(name).terms)
+                            for name in highlighterSet.highlighterNames}
+        matcher = HighlighterMatcher(highlighterTerms, **matchOptions(*options))
+        matcherCache[(directory, options)] = (signature, matcher)
+        return matcher
+
+
+# Returns the matches of each text, as lists of {highlighter, term, start, end} sorted by position.
+# This is what a worker runs.
+def highlightTexts(directory, signature, options, texts):
+    matcher = getMatcher(directory, signature, options)
+    results = []
+    for text in texts:
+        matches = []
+        for name, termSpans in matcher.findAll(text).items():
+            for term, spans in termSpans.items():
+                for start, end in spans:
+                    matches.append({'highlighter': name, 'term': term, 'start': start, 'end': end})
+        matches.sort(key=lambda m: (m['start'], m['end']))
+        results.append(matches)
+    return results
+
+
+class HighlightService:
+    def __init__(self, root, jobs=None):
+        self.root = os.path.realpath(root)
+        self.jobs = jobs
+        # With one job the documents are matched in the service's own process
+        self.executor = None if jobs == 1 else ProcessPoolExecutor(jobs)
+        self.workers = jobs or os.cpu_count() or 1
+        self.projects = {}  # project name -> highlighter names, for the projects used so far
+        self.projectSignatures = {}  # project name -> its signature when its highlighter names were read
+
+    # The directory of a project, which has to be inside the root
+    def projectDirectory(self, project):
+        if not isinstance(project, str): raise ServiceError('project must be a string')
+        directory = os.path.realpath(os.path.join(self.root, project))
+        if os.path.commonpath([directory, self.root]) != self.root or not os.path.isdir(directory):
+            raise ServiceError('unknown project: %s' % project, 404)
+        return directory
+
+    @timed('service.highlight')
+    def highlight(self, request):
+        if not isinstance(request, dict): raise ServiceError('the request must be a JSON object')
+        directory = self.projectDirectory(request.get('project', '.'))
+        options = request.get('options') or {}
+        if not isinstance(options, dict): raise ServiceError('options must be a JSON object')
+        options = (bool(options.get('inflections')), bool(options.get('wholeWords')))
+        documents = request.get('documents') or []
+        if not isinstance(documents, list): raise ServiceError('documents must be a list')
+        ids, texts = [], []
+        for i, document in enumerate(documents):
+            if isinstance(document, str): document = {'id': i, 'text': document}
+            if not isinstance(document, dict) or not isinstance(document.get('text'), str):
+                raise ServiceError('document %d has no text' % i)
+            ids.append(document.get('id', i))
+            texts.append(document['text'])
+        signature = projectSignature(directory)
+        if not signature: raise ServiceError('project has no highlighters: %s' % request.get('project', '.'), 404)
+        # Small requests are still spread over all of the workers
+        size = max(min(DOCUMENTS_PER_TASK, -(-len(texts) // self.workers)), 1)
+        batches = [texts[i:i + size] for i in range(0, len(texts), size)]
+        if self.executor:
+            futures = [self.executor.submit(highlightTexts, directory, signature, options, batch) for batch in batches]
+            batchResults = [f.result() for f in futures]
+        else:
+            batchResults = [highlightTexts(directory, signature, options, batch) for batch in batches]
+        # The names in the highlighters' headers, as in the matches, which needn't be their file names.
+        # They are only read again when the project changes.
+        project = os.path.relpath(directory, self.root)
+        if self.projectSignatures.get(project) != signature:
+            self.projects[project] = sorted(HighlighterSet(directory).highlighterNames)
+            self.projectSignatures[project] = signature
+        matches = [m for batch in batchResults for m in batch]
+        return {'results': [{'id': id, 'matches': m} for id, m in zip(ids, matches)]}
+
+    def close(self):
+        if self.executor: self.executor.shutdown()
+
+
+class HighlightRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/health':
+            self.reply(200, {'status': 'ok'})
+        elif self.path == '/projects':
+            self.reply(200, {'projects': self.server.service.projects})
+        else:
+            self.reply(404, {'error': 'not found: %s' % self.path})
+
+    def do_POST(self):
+        if self.path != '/highlight':
+            self.reply(404, {'error': 'not found: %s' % self.path})
+            return
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            if length > MAX_REQUEST_BYTES: raise ServiceError('request too large', 413)
+            try:
+                request = json.loads(self.rfile.read(length).decode('utf-8'))
+            except ValueError as e:
+                raise ServiceError('invalid JSON: %s' % e)
+            self.reply(200, self.server.service.highlight(request))
+        except ServiceError as e:
+            self.reply(e.status, {'error': str(e)})
+        except Exception as e:
+            self.reply(500, {'error': '%s: %s' % (type(e).__name__, e)})
+
+    def reply(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.server.verbose: BaseHTTPRequestHandler.log_message(self, format, *args)
+
+
+class HighlightServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, root, host=DEFAULT_HOST, port=DEFAULT_PORT, jobs=None, verbose=False):
+        self.service = HighlightService(root, jobs)
+        self.verbose = verbose
+        ThreadingHTTPServer.__init__(self, (host, port), HighlightRequestHandler)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return 'http://%s:%d' % (host, port)
+
+    def server_close(self):
+        ThreadingHTTPServer.server_close(self)
+        self.service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve highlighting of texts with the highlighters of projects under root.')
+    parser.add_argument('root', help='directory containing the project directories (or itself a project)')
+    parser.add_argument('--host', default=DEFAULT_HOST, help='address to listen on (default: %(default)s)')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='port to listen on (default: %(default)s)')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='worker processes (default: one per CPU)')
+    parser.add_argument('-v', '--verbose', action='store_true', help='log every request')
+    args = parser.parse_args(argv)
+
+    server = HighlightServer(args.root, args.host, args.port, args.jobs, args.verbose)
+    print("Serving %s at %s" % (server.service.root, server.url))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,6 +1,11 @@
-import os, glob
+import os, glob, time, atexit, threading
+from bisect import bisect_left
+from Instrumentation import timed
 
 HIGHLIGHTER_EXT = '.hil'
+JOURNAL_EXT = '.journal'  # Edits are journaled in fname + JOURNAL_EXT, e.g. Term.hil.journal
+JOURNAL_FLUSH_DELAY = 0.5  # Seconds without edits before the buffered edits are appended to the journal
+JOURNAL_COMPACT_DELAY = 5.0  # Seconds without edits before the journal is compacted into the .hil file
 
 class Highlighter:
     def __init__(self, fname, load=True):
@@ -10,34 +15,81 @@ class Highlighter:
         self.background = None
         self.terms = []
         self.terms.sort()
+        self.termsLoaded = False
+        self.journal = HighlighterJournal(self)
         if load: self.load()
 
+    # The terms are kept in a sorted list with no duplicates, so lookups are binary searches
     def addTerm(self, term):
         # Keep the terms in a sorted set
-        if self.containsTerm(term): return  # No duplicates allowed
-        self.terms.append(term)
+        i = bisect_left(self.terms, term)
+        if i < len(self.terms) and self.terms[i] == term: return  # No duplicates allowed
+        self.terms.insert(i, term)
+
+    # Adds many terms at once, e.g. when loading a highlighter or importing a glossary
+    def addTerms(self, terms):
+        newTerms = set(terms).difference(self.terms)
+        if not newTerms: return
+        # Two sorted runs - sort() just merges them
+        self.terms.extend(sorted(newTerms))
         self.terms.sort()
 
+    # Adds all of the terms of another Highlighter to this one
+    def mergeHighlighter(self, highlighter):
+        self.addTerms(highlighter.terms)
+
     def removeTerm(self, term):
-        try:
-            self.terms.remove(term)
-        except ValueError:
-            pass
+        i = self.indexOfTerm(term)
+        if i is not None: del self.terms[i]
+
+    # Adds a term and records the edit in the journal, which is written to disk in the background
+    def addTermAndSave(self, term):
+        with self.journal.lock:
+            if self.containsTerm(term): return
+            self.addTerm(term)
+            self.journal.record('+', term)
+
+    # Removes a term and records the edit in the journal, which is written to disk in the background
+    def removeTermAndSave(self, term):
+        with self.journal.lock:
+            if not self.containsTerm(term): return
+            self.removeTerm(term)
+            self.journal.record('-', term)
+
+    def removeTerms(self, terms):
+        oldTerms = set(terms)
+        self.terms = [t for t in self.terms if t not in oldTerms]
 
     def containsTerm(self, term):
-        return term in self.terms
+        return self.indexOfTerm(term) is not None
 
+    # The position of the term in the sorted terms, or None if it isn't there
+    def indexOfTerm(self, term):
+        i = bisect_left(self.terms, term)
+        return i if i < len(self.terms) and self.terms[i] == term else None
+
+    # Writes the whole highlighter. It is written to a temporary file which then replaces the .hil file,
+    # so a crash part way through leaves the old file intact. The journal is then no longer needed.
+    @timed('highlighter.save')
     def save(self):
         try:
-            with open(self.fname, 'w') as f:
-                f.write(self.name + '\n')
-                f.write(self.foreground + '\n')
-                f.write(self.background + '\n')
-                for line in self.terms:
-                    f.write(line + '\n')
+            with self.journal.lock:
+                tmpName = self.fname + '.tmp'
+                with open(tmpName, 'w') as f:
+                    f.write(self.name + '\n')
+                    f.write(self.foreground + '\n')
+                    f.write(self.background + '\n')
+                    for line in self.terms:
+                        f.write(line + '\n')
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmpName, self.fname)
+                self.journal.discard()
+                highlighterCache.remember(self)  # The file has changed, but it still matches this Highlighter
         except Exception as e:
             print("Highlighter file save error: ", e)
 
+    @timed('highlighter.load')
     def load(self):
         try:
             with open(self.fname, 'r') as f:
@@ -45,24 +97,203 @@ class Highlighter:
                 self.name = lines[0].strip()
                 self.foreground = lines[1].strip()
                 self.background = lines[2].strip()
-                for line in lines[3:]:
-                    self.addTerm(line.strip())
+                self.addTerms(line.strip() for line in lines[3:])
+            self.journal.replay()
+            self.termsLoaded = True
+        except Exception as e:
+            print("Highlighter file load error: ", e)
+
+    # Reads just the name and colours, leaving the terms to be loaded when they are needed
+    def loadHeader(self):
+        try:
+            with open(self.fname, 'r') as f:
+                self.name = f.readline().strip()
+                self.foreground = f.readline().strip()
+                self.background = f.readline().strip()
         except Exception as e:
             print("Highlighter file load error: ", e)
 
+    # A copy of the highlighter as it is now, which isn't changed by later edits.
+    # Background tasks read a snapshot, so the UI thread can go on editing the highlighter.
+    def snapshot(self):
+        h = Highlighter(self.fname, load=False)
+        h.name, h.foreground, h.background = self.name, self.foreground, self.background
+        h.terms = list(self.terms)
+        h.termsLoaded = self.termsLoaded
+        return h
+
     def __str__(self):
         return "Class Highlighter fname: " + self.fname
 
 
+# A HighlighterJournal makes a Highlighter's edits durable without rewriting the .hil file each time.
+# Each edit is a line, '+term' or '-term'. Edits are buffered, and appended to the journal once there have
+# been no edits for JOURNAL_FLUSH_DELAY seconds, so bursts of edits are written together.
+# After JOURNAL_COMPACT_DELAY seconds without edits, the journal is compacted: the Highlighter is saved
+# (atomically) and the journal deleted. Both happen on the journalScheduler's thread, not the UI thread.
+# A journal left behind (e.g. by a crash) is compacted the same way once it has been replayed.
+# Any journals still open are compacted when the program exits.
+class HighlighterJournal:
+    def __init__(self, highlighter):
+        self.highlighter = highlighter
+        self.lock = threading.RLock()
+        self.pending = []  # Edits that haven't been appended yet
+
+    @property
+    def fname(self):
+        return self.highlighter.fname + JOURNAL_EXT
+
+    def record(self, op, term):
+        with self.lock:
+            self.pending.append(op + term)
+            # Each edit puts them off again, so they only happen once the edits have stopped
+            journalScheduler.schedule(self, 'flush', JOURNAL_FLUSH_DELAY)
+            self.scheduleCompaction()
+
+    def scheduleCompaction(self):
+        journalScheduler.schedule(self, 'compact', JOURNAL_COMPACT_DELAY)
+        openJournals.add(self)
+
+    # Appends the buffered edits to the journal
+    def flush(self):
+        with self.lock:
+            if not self.pending: return
+            try:
+                with open(self.fname, 'a') as f:
+                    f.write('\n'.join(self.pending) + '\n')
+                self.pending = []
+                highlighterCache.remember(self.highlighter)
+            except Exception as e:
+                print("Highlighter journal write error: ", e)
+
+    # Folds the journal into the .hil file
+    def compact(self):
+        with self.lock:
+            if self.pending or os.path.exists(self.fname): self.highlighter.save()
+
+    # Called once the Highlighter has been saved in full - nothing outstanding is needed any more
+    def discard(self):
+        with self.lock:
+            self.pending = []
+            journalScheduler.cancel(self)
+            if os.path.exists(self.fname): os.remove(self.fname)
+            openJournals.discard(self)
+
+    # Applies the journaled edits to the Highlighter, e.g. after a crash before compaction
+    def replay(self):
+        if not os.path.exists(self.fname): return
+        with open(self.fname, 'r') as f:
+            lastOps = {}  # term -> its last op
+            for line in f:
+                line = line.rstrip('\n')
+                if line: lastOps[line[1:].strip()] = line[0]
+        self.highlighter.addTerms(term for term, op in lastOps.items() if op == '+')
+        self.highlighter.removeTerms(term for term, op in lastOps.items() if op == '-')
+        # Otherwise it would be replayed on every load until the next edit
+        if lastOps: self.scheduleCompaction()
+
+
+# Runs the journals' delayed flushes and compactions on one background thread. Scheduling an action again
+# just moves its time, so a burst of edits doesn't start a thread per edit.
+class JournalScheduler:
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.due = {}  # (journal, method name) -> time.monotonic() when it is due
+        self.thread = None
+
+    def schedule(self, journal, action, delay):
+        with self.condition:
+            self.due[(journal, action)] = time.monotonic() + delay
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='HighlighterJournal', daemon=True)
+                self.thread.start()
+            self.condition.notify()
+
+    def cancel(self, journal):
+        with self.condition:
+            for key in [key for key in self.due if key[0] is journal]:
+                del self.due[key]
+
+    def run(self):
+        while True:
+            with self.condition:
+                while True:
+                    now = time.monotonic()
+                    ready = sorted(((due, action, journal) for (journal, action), due in self.due.items()
+                                    if due <= now), key=lambda item: item[0])
+                    if ready: break
+                    self.condition.wait(min(self.due.values()) - now if self.due else None)
+                for due, action, journal in ready:
+                    del self.due[(journal, action)]
+            # The actions take the journal's lock, so they are run without holding the scheduler's
+            for due, action, journal in ready:
+                getattr(journal, action)()
+
+
+journalScheduler = JournalScheduler()
+
+
+# The journals with edits that haven't been compacted yet
+openJournals = set()
+
+
+@atexit.register
+def compactOpenJournals():
+    for journal in list(openJournals):
+        journal.compact()
+
+
+# Remembers every Highlighter read from a file, along with the file's modification time and size.
+# Reopening a project reuses the Highlighters whose files haven't changed, so only changed files are parsed.
+class HighlighterCache:
+    def __init__(self):
+        self.entries = {}  # fname -> (signature, Highlighter)
+
+    # Returns the cached Highlighter for fname, or None if there isn't one or the file has changed
+    def get(self, fname):
+        entry = self.entries.get(fname)
+        if entry is None: return None
+        signature, highlighter = entry
+        return highlighter if self.signature(fname) == signature else None
+
+    def remember(self, highlighter):
+        self.entries[highlighter.fname] = (self.signature(highlighter.fname), highlighter)
+
+    # The modification times and sizes of a highlighter's file and its journal, if it has one
+    def signature(self, fname):
+        st = os.stat(fname)
+        try:
+            journal = os.stat(fname + JOURNAL_EXT)
+            return st.st_mtime_ns, st.st_size, journal.st_mtime_ns, journal.st_size
+        except OSError:
+            return st.st_mtime_ns, st.st_size
+
+    def clear(self):
+        self.entries.clear()
+
+    def __str__(self):
+        return "Class HighlighterCache highlighters: %d" % len(self.entries)
+
+
+highlighterCache = HighlighterCache()
+
+
 # Find all of the .hil files in the specified directory and for each one
-# create a Highlighter
+# create a Highlighter.
+# Only the names and colours are read at first. A Highlighter's terms are loaded the first time it is got.
 class HighlighterSet:
+    @timed('highlighterSet.construct')
     def __init__(self, directory):
+        self.directory = directory
         self.path = os.path.join(directory, '*' + HIGHLIGHTER_EXT)
         self.files = glob.glob(self.path)
         self.highlighters = {}
         for f in self.files:
-            h = Highlighter(f)
+            h = highlighterCache.get(f)
+            if h is None:
+                h = Highlighter(f, load=False)
+                h.loadHeader()
+                highlighterCache.remember(h)
             self.highlighters[h.name] = h
 
     @property
@@ -70,7 +301,9 @@ class HighlighterSet:
         return list(self.highlighters.keys())
 
     def getHighlighter(self, name):
-        return self.highlighters[name]
+        h = self.highlighters[name]
+        if not h.termsLoaded: h.load()
+        return h
 
     def __str__(self):
         ret = "Class HighlighterSet directory: " + self.directory + ", path: " + self.path + ", files: "
@@ -84,6 +317,6 @@ if __name__ == '__main__':
     TESTProjectDir = os.path.join(os.getcwd(), 'TESTProject')
     print(TESTProjectDir)
     hiSet = HighlighterSet(TESTProjectDir)
-    for f in hiSet.highlighters.values():
-        print(f)
+    for name in hiSet.highlighterNames:
+        print(hiSet.getHighlighter(name))
     print(hiSet.highlighterNames)
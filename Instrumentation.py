@@ -0,0 +1,151 @@
+import os, json, time, atexit, cProfile, threading
+from bisect import bisect_left
+from functools import wraps
+
+# Instrumentation is off unless ASH_INSTRUMENT=1. When it is off, a timed function costs one flag check.
+# ASH_INSTRUMENT_FILE=timings.json also writes everything that was collected to that file on exit.
+INSTRUMENT_ENV = 'ASH_INSTRUMENT'
+INSTRUMENT_FILE_ENV = 'ASH_INSTRUMENT_FILE'
+# Upper bounds of the latency histogram buckets, in milliseconds. The last bucket holds everything slower.
+HISTOGRAM_BOUNDS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+# The latencies of one timed operation
+class Timer:
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.total = 0.0  # Seconds
+        self.min = None
+        self.max = None
+        self.buckets = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+
+    def record(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+        self.buckets[bisect_left(HISTOGRAM_BOUNDS, seconds * 1000)] += 1
+
+    # An upper bound for the q quantile (0 to 1), in seconds, from the histogram
+    def quantile(self, q):
+        if not self.count: return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank and n:
+                return HISTOGRAM_BOUNDS[i] / 1000 if i < len(HISTOGRAM_BOUNDS) else self.max
+        return self.max
+
+    def asDict(self):
+        return {'count': self.count, 'total': self.total, 'min': self.min, 'max': self.max,
+                'mean': self.total / self.count if self.count else None,
+                'p50': self.quantile(0.5), 'p99': self.quantile(0.99),
+                'histogram': dict(zip([str(b) for b in HISTOGRAM_BOUNDS] + ['inf'], self.buckets))}
+
+
+# Instruments collects counters and latency histograms for the hot paths, and can profile a single user action.
+# Functions are timed with the timed decorator. Everything is kept in memory until it is reset.
+class Instruments:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.timers = {}  # name -> Timer
+        self.counters = {}  # name -> count
+        self.local = threading.local()  # depth: how many timed calls the thread is inside
+        self.profileFname = None  # Set by profileNextAction
+        self.profiler = None
+
+    def record(self, name, seconds):
+        with self.lock:
+            timer = self.timers.get(name)
+            if timer is None: timer = self.timers[name] = Timer(name)
+            timer.record(seconds)
+
+    def increment(self, name, n=1):
+        if not self.enabled: return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    # Profiles the next user action - the next timed call that isn't inside another one - and writes
+    # the profile to fname. It can be read with pstats, e.g. python3 -m pstats fname
+    def profileNextAction(self, fname):
+        self.profileFname = fname
+
+    # Calls f, timing it as name
+    def call(self, name, f, *args, **kwargs):
+        depth = getattr(self.local, 'depth', 0)
+        profiler = None
+        if self.profileFname and depth == 0 and self.profiler is None:
+            with self.lock:
+                if self.profiler is None:
+                    profiler = self.profiler = cProfile.Profile()
+        self.local.depth = depth + 1
+        start = time.perf_counter()
+        try:
+            if profiler: return profiler.runcall(f, *args, **kwargs)
+            return f(*args, **kwargs)
+        finally:
+            self.record(name, time.perf_counter() - start)
+            self.local.depth = depth
+            if profiler: self.saveProfile(profiler)
+
+    def saveProfile(self, profiler):
+        fname, self.profileFname = self.profileFname, None
+        try:
+            profiler.dump_stats(fname)
+        except OSError as e:
+            print("Profile save error: ", e)
+        self.profiler = None
+
+    def reset(self):
+        with self.lock:
+            self.timers.clear()
+            self.counters.clear()
+
+    def asDict(self):
+        with self.lock:
+            return {'timers': {name: timer.asDict() for name, timer in sorted(self.timers.items())},
+                    'counters': dict(sorted(self.counters.items()))}
+
+    def dump(self, fname):
+        try:
+            with open(fname, 'w') as f:
+                json.dump(self.asDict(), f, indent=2)
+        except OSError as e:
+            print("Instrumentation dump error: ", e)
+
+    # A plain text table of the timers and counters, slowest total first
+    def report(self):
+        data = self.asDict()
+        lines = ["%-36s %7s %10s %9s %9s %9s" % ('Timer', 'Count', 'Total ms', 'Mean ms', 'p99 ms', 'Max ms')]
+        for name, t in sorted(data['timers'].items(), key=lambda item: -item[1]['total']):
+            lines.append("%-36s %7d %10.1f %9.2f %9.2f %9.2f" % (name, t['count'], t['total'] * 1000, t['mean'] * 1000,
+                                                                 t['p99'] * 1000, t['max'] * 1000))
+        if data['counters']:
+            lines.append('')
+            lines.append("%-36s %7s" % ('Counter', 'Count'))
+            for name, n in data['counters'].items():
+                lines.append("%-36s %7d" % (name, n))
+        return '\n'.join(lines)
+
+    def __str__(self):
+        return "Class Instruments enabled: %s, timers: %d, counters: %d" % \
+               (self.enabled, len(self.timers), len(self.counters))
+
+
+instruments = Instruments(os.environ.get(INSTRUMENT_ENV, '0') != '0')
+if instruments.enabled and os.environ.get(INSTRUMENT_FILE_ENV):
+    atexit.register(instruments.dump, os.environ[INSTRUMENT_FILE_ENV])
+
+
+# Decorates a function (or method) so that each call is timed as name while instrumentation is enabled
+def timed(name):
+    def decorate(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            if not instruments.enabled: return f(*args, **kwargs)
+            return instruments.call(name, f, *args, **kwargs)
+        return wrapper
+    return decorate
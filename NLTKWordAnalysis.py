@@ -1,9 +1,9 @@
+import atexit, threading
 from tkinter import *
 from tkinter.ttk import *
-from nltk.corpus import wordnet as wn
-import nltk
-from nltk import word_tokenize
-from inflection import *
+from AnalysisCache import *
+from BackgroundTasks import BackgroundTasks
+from Instrumentation import timed
 
 # This application uses Princeton WordNet
 # Citation:
@@ -70,13 +70,25 @@ PENN_TREEBANK_POS_TAGS = {'CC': 'Coordinating conjunction',
                           'WRB': 'Wh-adverb'}
 
 
+TREE_PLACEHOLDER = 'Loading...'
+
+
 # Python 3 needs a built in flatten function!!!!!
 # You can't do functional programming properly without one.
+# It uses a stack of iterators rather than recursion, so it takes linear time and any depth of nesting.
 def flatten(l):
-    if l == []:
-        return []
-    else:
-        return flatten(l[0]) + (flatten(l[1:]) if len(l) > 1 else []) if type(l) is list else [l]
+    if type(l) is not list: return [l]
+    flat = []
+    stack = [iter(l)]
+    while stack:
+        for item in stack[-1]:
+            if type(item) is list:
+                stack.append(iter(item))
+                break
+            flat.append(item)
+        else:
+            stack.pop()
+    return flat
 
 
 # Gets the word out of a Synset
@@ -84,62 +96,230 @@ def synsetWord(synset):
     return synset.lemmas()[0].name()
 
 
+# NLTK, WordNet and inflection are slow to import, and they are only needed when some text is explored,
+# so they are imported the first time they are used rather than when the application starts.
+nltk = None
+wn = None
+inflection = None
+nltkLock = threading.RLock()
+wordNetLoaded = False
+
+
+def loadNLTK():
+    global nltk, wn, inflection
+    if nltk is not None: return
+    with nltkLock:
+        if nltk is not None: return
+        import inflection
+        from nltk.corpus import wordnet
+        import nltk as nltkModule
+        wn = wordnet
+        nltk = nltkModule  # Set last, as it says everything has been imported
+
+
+# WordNet loads itself the first time it is used, and that isn't thread safe
+def ensureWordNetLoaded():
+    global wordNetLoaded
+    if wordNetLoaded: return
+    loadNLTK()
+    with nltkLock:
+        wn.ensure_loaded()
+        wordNetLoaded = True
+
+
+def word_tokenize(text):
+    loadNLTK()
+    return nltk.word_tokenize(text)
+
+
+def singularize(word):
+    loadNLTK()
+    return inflection.singularize(word)
+
+
+def pluralize(word):
+    loadNLTK()
+    return inflection.pluralize(word)
+
+
+# Preloads NLTK, the WordNet corpus, the tokenizer and the tagger, so the first exploration is fast
+def warmUp():
+    try:
+        ensureWordNetLoaded()
+        wn.synsets('warm')
+        nltk.pos_tag(word_tokenize('Warm up the tagger.'))
+        pluralize(singularize('warm up'))
+    except Exception as e:
+        print("NLTK warm up error: ", e)
+
+
+# Warms up in a background daemon thread, so it doesn't hold up the user interface or application exit
+def startWarmUp():
+    thread = threading.Thread(target=warmUp, name='NLTKWarmUp', daemon=True)
+    thread.start()
+    return thread
+
+
+# The analysis of a word. Only the strings are kept, not the synsets they came from.
+# It is shared by every occurrence of the word, so it holds nothing that depends on the context, like the POS tag.
+# It has slots rather than a __dict__, and tuples rather than lists, so that many of them take little memory.
+class WordRecord:
+    FIELDS = ('singular', 'plural', 'numSynsets', 'synonyms', 'hypernyms', 'hyponyms', 'definition', 'definitions',
+              'allSynonyms', 'allHypernyms', 'allHyponyms')
+    __slots__ = FIELDS
+
+    def __init__(self, **fields):
+        for name in self.FIELDS:
+            value = fields[name]
+            setattr(self, name, tuple(value) if isinstance(value, list) else value)
+
+    # As a dict, which is how it is stored as JSON
+    def asDict(self):
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+    @classmethod
+    def fromDict(cls, fields):
+        return cls(**fields)
+
+
+# Analyzes a word with WordNet and inflection
+def analyzeWord(word):
+    ensureWordNetLoaded()
+    synsets = wn.synsets(word)
+    return WordRecord(singular=singularize(word),
+                      plural=pluralize(word),
+                      numSynsets=len(synsets),
+                      synonyms=synsets[0].lemma_names() if synsets else [],
+                      hypernyms=flatten([s.lemma_names() for s in synsets[0].hypernyms()]) if synsets else [],
+                      hyponyms=flatten([s.lemma_names() for s in synsets[0].hyponyms()]) if synsets else [],
+                      definition=synsets[0].definition() if synsets else 'Not in WordNet',
+                      definitions=[synsetWord(s) + ": " + s.definition() for s in synsets],
+                      # Across all of the synsets, not just the first
+                      allSynonyms=uniqueLemmaNames(synsets),
+                      allHypernyms=uniqueLemmaNames([h for s in synsets for h in s.hypernyms()]),
+                      allHyponyms=uniqueLemmaNames([h for s in synsets for h in s.hyponyms()]))
+
+
+# The lemma names of a list of synsets, in order, without duplicates
+def uniqueLemmaNames(synsets):
+    return list(dict.fromkeys(name for s in synsets for name in s.lemma_names()))
+
+
+# An AnalysisCache of WordRecords, which are stored as JSON dicts
+class WordAnalysisCache(AnalysisCache):
+    def encode(self, record):
+        return record.asDict()
+
+    def decode(self, data):
+        return WordRecord.fromDict(data)
+
+
+# The cache shared by every WordAnalysis. Call openAnalysisCache to make it persistent.
+analysisCache = WordAnalysisCache()
+atexit.register(analysisCache.close)
+
+
+# Keeps the analyses in directory (normally the project directory) so they survive restarts
+def openAnalysisCache(directory):
+    analysisCache.open(directory)
+
+
+# A word, its POS tag in context, and its WordRecord, which is shared with every other analysis of the word
 class WordAnalysis:
-    def __init__(self, word):
+    __slots__ = ('word', 'tag', 'analysis')
+
+    @timed('wordAnalysis.construct')
+    def __init__(self, word, tag=None, cache=None):
         self.word = word
-        self.singular = singularize(word)
-        self.plural = pluralize(word)
-        self.synsets = wn.synsets(word)
-        self.numSynsets = len(self.synsets)
+        self.tag = tag  # The POS tag of the word in context, if it is known
+        self.analysis = (cache or analysisCache).get(word, analyzeWord)
 
     @property
-    def synonyms(self, i=0):
-        try:
-            return self.synsets[i].lemma_names()
-        except:
-            return []
+    def singular(self):
+        return self.analysis.singular
 
     @property
-    def hyponyms(self, i=0):
-        try:
-            return flatten([s.lemma_names() for s in self.synsets[i].hyponyms()])
-        except:
-            return []
+    def plural(self):
+        return self.analysis.plural
 
     @property
-    def hypernyms(self, i=0):
-        try:
-            return flatten([s.lemma_names() for s in self.synsets[i].hypernyms()])
-        except:
-            return []
+    def numSynsets(self):
+        return self.analysis.numSynsets
 
+    # The synsets aren't cached, so they are only looked up if they are asked for
     @property
-    def definition(self, i=0):
-        try:
-            return self.synsets[i].definition()
-        except:
-            return 'Not in WordNet'
+    def synsets(self):
+        ensureWordNetLoaded()
+        return wn.synsets(self.word)
 
     @property
-    def definitions(self):
-        try:
-            return [synsetWord(s) + ": " + s.definition() for s in self.synsets]
+    def synonyms(self):
+        return self.analysis.synonyms
 
-        except:
-            return 'Not in WordNet'
+    @property
+    def hyponyms(self):
+        return self.analysis.hyponyms
 
+    @property
+    def hypernyms(self):
+        return self.analysis.hypernyms
+
+    @property
+    def definition(self):
+        return self.analysis.definition
+
+    @property
+    def definitions(self):
+        return self.analysis.definitions
+
+    # The POS in context if the tag is known, otherwise the word is tagged on its own
     @property
     def pos(self):
-        w, tag = nltk.pos_tag([self.word])[0]
-        return PENN_TREEBANK_POS_TAGS[tag]
+        tag = self.tag
+        if tag is None:
+            loadNLTK()
+            w, tag = nltk.pos_tag([self.word])[0]
+        return PENN_TREEBANK_POS_TAGS.get(tag, tag)
+
+
+# The WordAnalysis of each word of a text, in order. It can be indexed and iterated as often as needed.
+# Each distinct (word, tag) is only analyzed once, the first time it is asked for, and repeats share the analysis.
+class AnalyzedWords:
+    __slots__ = ('words', 'tags', 'cache', 'analyses')
+
+    def __init__(self, words, tags, cache=None):
+        self.words = words
+        self.tags = tags
+        self.cache = cache
+        self.analyses = {}  # (word, tag) -> WordAnalysis
+
+    def analysis(self, word, tag):
+        aw = self.analyses.get((word, tag))
+        if aw is None: aw = self.analyses[(word, tag)] = WordAnalysis(word, tag, self.cache)
+        return aw
+
+    # The analyses of the distinct (word, tag)s, in the order they first occur
+    def unique(self):
+        return [self.analysis(word, tag) for word, tag in dict.fromkeys(zip(self.words, self.tags))]
+
+    def __getitem__(self, i):
+        return self.analysis(self.words[i], self.tags[i])
+
+    def __len__(self):
+        return len(self.words)
+
+    def __iter__(self):
+        return map(self.analysis, self.words, self.tags)
 
 
 class TextAnalysis:
     def __init__(self, text):
         self.text = text
         self.words = word_tokenize(text)
-        self.analyzedText = nltk.Text(self.words)
-        self.analyzedWords = map(WordAnalysis, self.words)
+        loadNLTK()
+        # Tag all of the words in one call, so the tagger is only run once and each word is tagged in context
+        self.tags = [tag for w, tag in nltk.pos_tag(self.words)]
+        self.analyzedWords = AnalyzedWords(self.words, self.tags)
 
 
 # TextAnalysisTreeview is a specialized Treeview that shows Word Net information for some text.
@@ -148,42 +328,72 @@ class TextAnalysis:
 # Both classes are completely orthogonal and have no overlapping attributes or operations. We can combine them safely.
 class TextAnalysisTreeview(TextAnalysis, Treeview):
     def __init__(self, root, text):
-        TextAnalysis.__init__(self, text)
         Treeview.__init__(self, root)
         self.root = root
-        treeRootIndex = 1
-        for aw in self.analyzedWords:
-            # The word is the root of the tree
-            treeRoot = self.insert("", treeRootIndex, text=aw.word)
+        # All of the NLTK work is done by background tasks, so the window appears at once
+        self.tasks = BackgroundTasks(self)
+        self.bind('<Destroy>', lambda e: self.tasks.cancel())
+        self.unopenedWords = {}  # Tree root -> (word, tag)
+        self.loadingRoot = self.insert("", 0, text=TREE_PLACEHOLDER)
+        # TextAnalysis.__init__ sets self.words, self.tags and self.analyzedWords in the background.
+        # They aren't used until textAnalyzed.
+        self.tasks.submit(self.textAnalyzed, TextAnalysis.__init__, self, text,
+                          errback=lambda e: self.item(self.loadingRoot, text='Error: %s' % e))
+        self.bind('<<TreeviewOpen>>', self.treeRootOpened)
+
+    def textAnalyzed(self, result):
+        self.delete(self.loadingRoot)
+        # Each word is the root of a tree. Creating it is cheap: the word is only analyzed and its
+        # children inserted when the node is opened. Until then a placeholder child makes it openable.
+        for i, (word, tag) in enumerate(zip(self.words, self.tags)):
+            treeRoot = self.insert("", i, text=word)
+            self.insert(treeRoot, 0, text=TREE_PLACEHOLDER)
+            self.unopenedWords[treeRoot] = (word, tag)
+
+    def treeRootOpened(self, event):
+        treeRoot = self.focus()
+        # A word is populated the first time it is opened. After that its children are kept, so re-opening is free.
+        if treeRoot not in self.unopenedWords: return
+        word, tag = self.unopenedWords.pop(treeRoot)
+        self.tasks.submit(lambda aw: self.wordAnalyzed(treeRoot, aw), self.analyzedWords.analysis, word, tag,
+                          errback=lambda e: self.wordAnalyzed(treeRoot, None, e))
+
+    def wordAnalyzed(self, treeRoot, aw, error=None):
+        if not self.exists(treeRoot): return
+        self.delete(*self.get_children(treeRoot))
+        if error is None:
+            self.insertWordAnalysis(treeRoot, aw)
+        else:
+            self.insert(treeRoot, 0, text='Error: %s' % error)
+
+    def insertWordAnalysis(self, treeRoot, aw):
+        treeRootIndex = 0
+        for i, d in enumerate(aw.definitions):
+            self.insert(treeRoot, treeRootIndex, text="%d: %s" % (i, d))
             treeRootIndex += 1
 
-            # self.insert(treeRoot, 2, text=aw.definition)
-            for i, d in enumerate(aw.definitions):
-                self.insert(treeRoot, treeRootIndex, text="%d: %s" % (i, d))
-                treeRootIndex += 1
+        self.insert(treeRoot, treeRootIndex, text=aw.pos)
+        treeRootIndex += 1
 
-            self.insert(treeRoot, treeRootIndex, text=aw.pos)
-            treeRootIndex += 1
+        inflectionsRoot = self.insert(treeRoot, treeRootIndex, text="Inflections")
+        treeRootIndex += 1
+        self.insert(inflectionsRoot, 1, text='Singular: ' + aw.singular)
+        self.insert(inflectionsRoot, 2, text='Plural: ' + aw.plural)
 
-            inflectionsRoot = self.insert(treeRoot, treeRootIndex, text="Inflections")
-            treeRootIndex += 1
-            self.insert(inflectionsRoot, 1, text='Singular: ' + aw.singular)
-            self.insert(inflectionsRoot, 2, text='Plural: ' + aw.plural)
+        synonymsRoot = self.insert(treeRoot, treeRootIndex, text="Synonyms")
+        treeRootIndex += 1
+        for i, s in enumerate(aw.synonyms):
+            self.insert(synonymsRoot, i, text=s)
 
-            synonymsRoot = self.insert(treeRoot, treeRootIndex, text="Synonyms")
-            treeRootIndex += 1
-            for i, s in enumerate(aw.synonyms):
-                self.insert(synonymsRoot, i, text=s)
+        hypernymsRoot = self.insert(treeRoot, treeRootIndex, text="Hypernyms")
+        treeRootIndex += 1
+        for i, s in enumerate(aw.hypernyms):
+            self.insert(hypernymsRoot, i, text=s)
 
-            hypernymsRoot = self.insert(treeRoot, treeRootIndex, text="Hypernyms")
-            treeRootIndex += 1
-            for i, s in enumerate(aw.hypernyms):
-                self.insert(hypernymsRoot, i, text=s)
-
-            hyponymsRoot = self.insert(treeRoot, treeRootIndex, text="Hyponyms")
-            treeRootIndex += 1
-            for i, s in enumerate(aw.hyponyms):
-                self.insert(hyponymsRoot, i, text=s)
+        hyponymsRoot = self.insert(treeRoot, treeRootIndex, text="Hyponyms")
+        treeRootIndex += 1
+        for i, s in enumerate(aw.hyponyms):
+            self.insert(hyponymsRoot, i, text=s)
 
 
 # A child window that shows WordNet information for some text
@@ -210,8 +420,7 @@ class WordNetInfoWindowTestWindow(Frame):
 if __name__ == '__main__':
     t = TextAnalysis('no cats and dogs')
     print(t.words)
-    print(t.analyzedText)
-    for aw in t.analyzedWords:
+    for aw in t.analyzedWords.unique():
         print(aw.singular)
         print(aw.plural)
         print(aw.hyponyms)
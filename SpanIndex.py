@@ -0,0 +1,47 @@
+from bisect import bisect_left
+from collections import Counter
+
+
+# A SpanIndex holds (start, end) character offset spans, which may overlap, in a sorted array.
+# It finds the spans that overlap a region (e.g. the visible part of a document) with two
+# binary searches, so lookups stay fast however many spans there are.
+class SpanIndex:
+    def __init__(self, spans=()):
+        self.spans = sorted(spans)
+        self.maxLength = max((end - start for start, end in self.spans), default=0)
+
+    def addSpans(self, spans):
+        spans = list(spans)
+        if not spans: return
+        self.maxLength = max(self.maxLength, max(end - start for start, end in spans))
+        # Two sorted runs - sort() just merges them
+        self.spans.extend(sorted(spans))
+        self.spans.sort()
+
+    # Removes one copy of each of the spans. maxLength is left alone - it only has to be an upper bound.
+    def removeSpans(self, spans):
+        removed = Counter(spans)
+        if not removed: return
+        kept = []
+        for span in self.spans:
+            if removed[span]:
+                removed[span] -= 1
+            else:
+                kept.append(span)
+        self.spans = kept
+
+    # Returns the spans that overlap the region start to end, in order
+    def overlapping(self, start, end):
+        # Nothing that starts more than maxLength before the region can reach into it
+        lo = bisect_left(self.spans, (start - self.maxLength,))
+        hi = bisect_left(self.spans, (end,))
+        return [span for span in self.spans[lo:hi] if span[1] > start]
+
+    def __len__(self):
+        return len(self.spans)
+
+    def __iter__(self):
+        return iter(self.spans)
+
+    def __str__(self):
+        return "Class SpanIndex spans: %d" % len(self.spans)
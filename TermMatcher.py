@@ -0,0 +1,276 @@
+from bisect import bisect_right
+from collections import deque
+from heapq import heappush, heappop
+from Instrumentation import timed
+from TokenIndex import TokenMatcher
+
+
+# TermMatcher finds every occurrence of a set of terms in a single pass over a document.
+# It is an Aho-Corasick automaton: a trie of the terms with failure links, so the cost of
+# matching grows with the length of the document rather than with terms x document.
+# It is pure Python and knows nothing about Tk, so it can be used (and benchmarked) headless.
+#
+# For each term, matches are reported the same way as successive Text.search calls:
+# leftmost first, and non-overlapping with earlier matches of the same term.
+# Matches of different terms may overlap (e.g. "Miskatonic" and "Miskatonic University").
+#
+# Optionally each term can be matched through several variants (e.g. termVariants gives its singular
+# and plural), and case can be ignored. The variants are just more patterns in the same automaton,
+# so this costs no more per document. Matches are reported against the original term, and when
+# variants of a term match at the same start (e.g. "book" and "books") the longest one wins.
+class TermMatcher:
+    @timed('termMatcher.build')
+    def __init__(self, terms, variants=None, foldCase=False):
+        self.terms = []
+        self.termNumbers = {}  # term -> index into self.terms
+        self.maxLengths = []  # The length of each term's longest pattern
+        self.variants = variants
+        self.foldCase = foldCase
+        self.hasVariants = False
+        # The trie is held in parallel lists indexed by node number. Node 0 is the root.
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]  # (index into self.terms, pattern length) of the patterns ending at each node
+        for term in terms:
+            self.addTerm(term)
+        self.build()
+
+    def addTerm(self, term):
+        if not term or term in self.termNumbers: return  # Empty terms never match; no duplicates
+        patterns = set(self.fold(p) for p in (self.variants(term) if self.variants else [term]) if p)
+        patterns.add(self.fold(term))
+        if len(patterns) > 1: self.hasVariants = True
+        self.termNumbers[term] = len(self.terms)
+        self.maxLengths.append(max(len(p) for p in patterns))
+        for pattern in patterns:
+            self.addPattern(pattern, len(self.terms))
+        self.terms.append(term)
+
+    def addPattern(self, pattern, t):
+        node = 0
+        for c in pattern:
+            nxt = self.goto[node].get(c)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[node][c] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            node = nxt
+        self.output[node].append((t, len(pattern)))
+
+    # Lower cases text if the matcher ignores case. A few characters (e.g. 'İ') lower case to more than
+    # one character; they are left alone, so offsets in the folded text are the same as in the original.
+    def fold(self, text):
+        if not self.foldCase: return text
+        folded = text.lower()
+        if len(folded) == len(text): return folded
+        return ''.join(c.lower() if len(c.lower()) == 1 else c for c in text)
+
+    # Compute the failure links breadth first and merge the outputs along them
+    def build(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for c, nxt in self.goto[node].items():
+                queue.append(nxt)
+                f = self.fail[node]
+                while f and c not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(c, 0)
+                self.output[nxt] = self.output[nxt] + self.output[self.fail[nxt]]
+
+    # Generates (start, end, term) for every match in text, in order of end offset
+    def iterMatches(self, text):
+        return self.iterChunkMatches([text])
+
+    # Generates (start, end, term) for every match in a document given as a sequence of text chunks.
+    # The offsets are from the start of the document. The automaton's state is carried from one
+    # chunk to the next, so matches that straddle chunk boundaries are found without any rescanning.
+    # With markChunks, (offset, offset, None) is also generated after each chunk, where offset is the end
+    # of the text read so far. Every match generated after it starts later than offset - the longest pattern.
+    def iterChunkMatches(self, chunks, markChunks=False):
+        if self.foldCase: chunks = map(self.fold, chunks)
+        if self.hasVariants: return self.iterVariantMatches(chunks, markChunks)
+        return self.iterPatternMatches(chunks, markChunks)
+
+    def iterPatternMatches(self, chunks, markChunks=False):
+        goto, fail, output, terms = self.goto, self.fail, self.output, self.terms
+        lastEnd = [0] * len(terms)
+        node = 0
+        offset = 0
+        for chunk in chunks:
+            for i, c in enumerate(chunk, offset + 1):
+                while node and c not in goto[node]:
+                    node = fail[node]
+                node = goto[node].get(c, 0)
+                if output[node]:
+                    for t, length in output[node]:
+                        start = i - length
+                        if start >= lastEnd[t]:
+                            lastEnd[t] = i
+                            yield start, i, terms[t]
+            offset += len(chunk)
+            if markChunks: yield offset, offset, None
+
+    # As iterPatternMatches, but a match is held back until no longer variant of the term could still
+    # extend it, i.e. until the scan is the term's longest pattern past its start. Later matches of the term
+    # are held back as candidates too, until the matches before them are settled. So matches come out at most
+    # that many characters late, in order of start for each term.
+    def iterVariantMatches(self, chunks, markChunks=False):
+        goto, fail, output, terms, maxLengths = self.goto, self.fail, self.output, self.terms, self.maxLengths
+        lastEnd = [0] * len(terms)
+        candidates = {}  # t -> {start -> longest end} of the matches being held back
+        deadlines = []  # Heap of (position after which the candidate can't grow, t, start)
+
+        def settle(t, start):
+            held = candidates[t]
+            end = held.pop(start, None)
+            if end is None: return None  # It overlapped an earlier match
+            lastEnd[t] = end
+            for overlapping in [s for s in held if s < end]:
+                del held[overlapping]
+            return start, end, terms[t]
+
+        node = 0
+        offset = 0
+        for chunk in chunks:
+            for i, c in enumerate(chunk, offset + 1):
+                while node and c not in goto[node]:
+                    node = fail[node]
+                node = goto[node].get(c, 0)
+                for t, length in output[node]:
+                    start = i - length
+                    if start < lastEnd[t]: continue  # Overlaps the last match
+                    held = candidates.setdefault(t, {})
+                    if start not in held: heappush(deadlines, (start + maxLengths[t], t, start))
+                    held[start] = i  # The longest so far, as matches are found in order of end
+                # The candidates are settled in order of start, so the earliest start always wins
+                while deadlines and deadlines[0][0] <= i:
+                    d, t, start = heappop(deadlines)
+                    match = settle(t, start)
+                    if match: yield match
+            offset += len(chunk)
+            if markChunks: yield offset, offset, None
+        while deadlines:
+            d, t, start = heappop(deadlines)
+            match = settle(t, start)
+            if match: yield match
+
+    # Every match generated after one of iterChunkMatches's marks starts later than its offset - markLag
+    @property
+    def markLag(self):
+        return max(self.maxLengths, default=0)
+
+    # Returns a dict of term -> list of (start, end) spans, covering every term
+    @timed('termMatcher.findAll')
+    def findAll(self, text):
+        spans = {t: [] for t in self.terms}
+        for start, end, term in self.iterMatches(text):
+            spans[term].append((start, end))
+        return spans
+
+    def __str__(self):
+        return "Class TermMatcher terms: %d, nodes: %d" % (len(self.terms), len(self.goto))
+
+
+# Returns the (start, end) spans of a single term in text, matched exactly the way TermMatcher matches it.
+# For one term without variants, str.find is much faster than building and running the pure Python automaton.
+@timed('findTerm')
+def findTerm(text, term):
+    spans = []
+    if not term: return spans
+    i = text.find(term)
+    while i >= 0:
+        spans.append((i, i + len(term)))
+        i = text.find(term, i + len(term))
+    return spans
+
+
+# HighlighterMatcher matches the terms of several highlighters in one combined pass.
+# highlighterTerms is a dict of highlighter name -> terms. A term may belong to several highlighters.
+# With wholeWords, the terms are matched as token sequences by a TokenMatcher, and findAll takes a TokenIndex
+# (or text).
+class HighlighterMatcher:
+    def __init__(self, highlighterTerms, variants=None, foldCase=False, wholeWords=False, tokenize=None):
+        self.highlighterNames = list(highlighterTerms.keys())
+        self.termHighlighters = {}  # term -> names of the highlighters it belongs to
+        for name, terms in highlighterTerms.items():
+            for term in terms:
+                self.termHighlighters.setdefault(term, []).append(name)
+        if wholeWords:
+            self.matcher = TokenMatcher(self.termHighlighters.keys(), variants, foldCase, tokenize)
+        else:
+            self.matcher = TermMatcher(self.termHighlighters.keys(), variants, foldCase)
+
+    # Generates (start, end, term, highlighter names) for every match in a sequence of text chunks.
+    # With markChunks, a mark is generated after each chunk as (offset, offset, None, ()) - see TermMatcher,
+    # TokenMatcher and markLag.
+    def iterChunkMatches(self, chunks, markChunks=False):
+        for start, end, term in self.matcher.iterChunkMatches(chunks, markChunks):
+            yield start, end, term, self.termHighlighters[term] if term is not None else ()
+
+    @property
+    def markLag(self):
+        return self.matcher.markLag
+
+    # Returns a dict of highlighter name -> {term -> list of (start, end) spans}
+    @timed('highlighterMatcher.findAll')
+    def findAll(self, text):
+        spans = {name: {} for name in self.highlighterNames}
+        for term, termSpans in self.matcher.findAll(text).items():
+            for name in self.termHighlighters[term]:
+                spans[name][term] = termSpans
+        return spans
+
+    def __str__(self):
+        return "Class HighlighterMatcher highlighters: %d, %s" % (len(self.highlighterNames), self.matcher)
+
+
+# Converts character offsets in a document into Tk Text "line.column" indices.
+# The line starts are computed once so each conversion is a binary search.
+class LineIndex:
+    def __init__(self, text):
+        self.lineStarts = [0]
+        i = text.find('\n')
+        while i != -1:
+            self.lineStarts.append(i + 1)
+            i = text.find('\n', i + 1)
+
+    def index(self, offset):
+        line = bisect_right(self.lineStarts, offset)
+        return "%d.%d" % (line, offset - self.lineStarts[line - 1])
+
+    def offset(self, index):
+        line, column = index.split('.')
+        return self.lineStarts[int(line) - 1] + int(column)
+
+
+if __name__ == '__main__':
+    # A simple timing comparison against one str.find scan per term
+    import os, time
+    from Highlighter import HighlighterSet
+
+    TESTProjectDir = os.path.join(os.getcwd(), 'TESTProject')
+    with open(os.path.join(TESTProjectDir, 'OLASVisionStatement.txt'), 'r') as f:
+        text = f.read() * 200
+    terms = set()
+    hiSet = HighlighterSet(TESTProjectDir)
+    for name in hiSet.highlighterNames:
+        terms.update(hiSet.getHighlighter(name).terms)
+    terms.update(text.split()[:300])
+
+    start = time.perf_counter()
+    matcher = TermMatcher(terms)
+    spans = matcher.findAll(text)
+    print("TermMatcher: %d terms, %d matches, %.3fs" %
+          (len(matcher.terms), sum(map(len, spans.values())), time.perf_counter() - start))
+
+    start = time.perf_counter()
+    count = 0
+    for t in matcher.terms:
+        i = text.find(t)
+        while i != -1:
+            count += 1
+            i = text.find(t, i + len(t))
+    print("str.find per term: %d matches, %.3fs" % (count, time.perf_counter() - start))
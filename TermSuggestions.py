@@ -0,0 +1,47 @@
+from concurrent.futures import ThreadPoolExecutor
+from NLTKWordAnalysis import WordAnalysis
+from TermMatcher import HighlighterMatcher
+
+SUGGESTION_THREADS = 8
+# The WordAnalysis fields that suggestions come from, and how each relates to the term
+RELATIONS = (('allSynonyms', 'synonym'), ('allHypernyms', 'hypernym'), ('allHyponyms', 'hyponym'))
+
+
+# A word related to one or more of a highlighter's terms, and how often it occurs in the document
+class Suggestion:
+    def __init__(self, word, count, reasons):
+        self.word = word
+        self.count = count
+        self.reasons = reasons  # e.g. ['synonym of book', 'hyponym of library']
+
+    def __str__(self):
+        return "%s (%d): %s" % (self.word, self.count, ', '.join(self.reasons))
+
+
+# Returns (word, relation) for every WordNet synonym, hypernym and hyponym of a term, across all its synsets.
+# WordNet writes multi-word lemmas with underscores (reference_material), the highlighters use spaces.
+def relatedWords(term):
+    analysis = WordAnalysis(term.replace(' ', '_')).analysis
+    return [(word.replace('_', ' '), relation) for field, relation in RELATIONS for word in getattr(analysis, field)]
+
+
+# Suggests terms to add to a highlighter: the WordNet relatives of all of its terms, without duplicates or
+# words it already has, ranked by how often they occur in text. They are counted the way they would be
+# highlighted: matcherOptions are the keyword arguments of HighlighterMatcher (e.g. from matchOptions).
+# The terms are looked up in parallel, and every lookup goes through the analysis cache.
+# This runs in the background, so give it a snapshot of the highlighter, not one that is being edited.
+def suggestRelatedTerms(highlighter, text, threads=SUGGESTION_THREADS, matcherOptions=None):
+    terms = [t for t in highlighter.terms if t]
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        related = list(pool.map(relatedWords, terms))
+    candidates = {}  # word -> reasons
+    for term, words in zip(terms, related):
+        for word, relation in words:
+            if word == term or highlighter.containsTerm(word): continue
+            candidates.setdefault(word, []).append('%s of %s' % (relation, term))
+    # Count every candidate in one pass over the text
+    spans = HighlighterMatcher({highlighter.name: candidates.keys()}, **(matcherOptions or {})).findAll(text)
+    spans = spans[highlighter.name]
+    suggestions = [Suggestion(word, len(spans.get(word, [])), reasons) for word, reasons in candidates.items()]
+    suggestions.sort(key=lambda s: (-s.count, s.word))
+    return suggestions
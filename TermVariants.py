@@ -0,0 +1,22 @@
+from functools import lru_cache
+
+# Inflection aware matching. Requires inflection (see NLTKWordAnalysis.py), which is only
+# imported the first time a variant is needed.
+
+
+# The forms of a term that are matched in inflection aware mode: the term itself, its singular and its plural.
+# inflection changes the last word, so multi-word terms work too ("reference materials" -> "reference material").
+# Each term's variants are worked out once and then cached.
+@lru_cache(maxsize=None)
+def termVariants(term):
+    import inflection
+    return tuple(sorted({term, inflection.singularize(term), inflection.pluralize(term)}))
+
+
+# The keyword arguments for a HighlighterMatcher that matches the way the options say: inflections matches each
+# term's singular and plural, ignoring case, and wholeWords matches terms as whole tokens.
+# Leave out wholeWords for a TermMatcher or TokenMatcher, which are already one or the other.
+def matchOptions(inflections=False, wholeWords=False):
+    options = {'variants': termVariants, 'foldCase': True} if inflections else {}
+    if wholeWords: options['wholeWords'] = True
+    return options
@@ -0,0 +1,167 @@
+from Instrumentation import timed
+
+# word_tokenize writes double quotes as `` and '', so they have to be found as " in the text
+QUOTE_TOKENS = ('``', "''")
+
+
+# The default tokenizer is NLTK's, through NLTKWordAnalysis, which is only imported when it is first needed
+def defaultTokenize(text):
+    from NLTKWordAnalysis import word_tokenize
+    return word_tokenize(text)
+
+
+# A TokenIndex is a document tokenized once, with the (start, end) character offsets of every token.
+# tokenize is any function from text to a list of tokens, which must appear in the text in order.
+class TokenIndex:
+    @timed('tokenIndex.build')
+    def __init__(self, text, tokenize=None):
+        self.tokenize = tokenize or defaultTokenize
+        self.tokens = []
+        self.starts = []
+        self.ends = []
+        self.folded = None  # The case folded tokens, made when they are first needed
+        position = 0
+        for token in self.tokenize(text):
+            start, length = self.find(text, token, position)
+            if start < 0: continue  # The tokenizer changed it beyond recognition, so it can't be highlighted
+            self.tokens.append(token)
+            self.starts.append(start)
+            self.ends.append(start + length)
+            position = start + length
+
+    # Returns the start and length of token in text, searching from position, or (-1, 0)
+    @staticmethod
+    def find(text, token, position):
+        start = text.find(token, position)
+        if token in QUOTE_TOKENS:
+            quote = text.find('"', position)
+            if quote >= 0 and (start < 0 or quote < start): return quote, 1
+        return start, len(token) if start >= 0 else 0
+
+    def foldedTokens(self):
+        if self.folded is None: self.folded = [t.casefold() for t in self.tokens]
+        return self.folded
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def __str__(self):
+        return "Class TokenIndex tokens: %d" % len(self.tokens)
+
+
+# TokenMatcher matches terms as whole token sequences, so "art" doesn't match inside "start" or "party".
+# Each term is tokenized the same way as the document, and its token n-gram is put in a dict. Matching looks
+# up the n-grams starting at each document token that begins a term, so the cost grows with the number of
+# document tokens, not terms x characters.
+# It takes the same options as TermMatcher and reports matches the same way: for each term, leftmost first
+# and not overlapping earlier matches of the same term, with the longest variant winning at each start.
+class TokenMatcher:
+    @timed('tokenMatcher.build')
+    def __init__(self, terms, variants=None, foldCase=False, tokenize=None):
+        self.terms = []
+        self.termNumbers = {}
+        self.variants = variants
+        self.foldCase = foldCase
+        self.tokenize = tokenize or defaultTokenize
+        self.ngrams = {}  # tuple of tokens -> indices into self.terms
+        self.firstTokens = set()
+        self.lengths = []  # The n-gram lengths, longest first
+        for term in terms:
+            self.addTerm(term)
+        self.lengths.sort(reverse=True)
+
+    def addTerm(self, term):
+        if not term or term in self.termNumbers: return
+        t = self.termNumbers[term] = len(self.terms)
+        self.terms.append(term)
+        patterns = set(p for p in (self.variants(term) if self.variants else []) if p)
+        patterns.add(term)
+        for pattern in patterns:
+            tokens = tuple(self.fold(token) for token in self.tokenize(pattern))
+            if not tokens: continue
+            numbers = self.ngrams.setdefault(tokens, [])
+            if t not in numbers: numbers.append(t)
+            self.firstTokens.add(tokens[0])
+            if len(tokens) not in self.lengths: self.lengths.append(len(tokens))
+
+    def fold(self, token):
+        return token.casefold() if self.foldCase else token
+
+    # Generates (start, end, term) for every match, in order of start.
+    # target is a TokenIndex, or text which is then tokenized.
+    def iterMatches(self, target):
+        index = target if isinstance(target, TokenIndex) else TokenIndex(target, self.tokenize)
+        tokens = index.foldedTokens() if self.foldCase else index.tokens
+        nextStarts = [0] * len(self.terms)  # The first token each term's next match may start at
+        for i, token in enumerate(tokens):
+            if token not in self.firstTokens: continue
+            for n, t in self.matchesAt(tokens, i):
+                if nextStarts[t] > i: continue
+                nextStarts[t] = i + n
+                yield index.starts[i], index.ends[i + n - 1], self.terms[t]
+
+    # Generates (number of tokens, index into self.terms) for each n-gram of a term that starts at tokens[i],
+    # longest first
+    def matchesAt(self, tokens, i):
+        for n in self.lengths:
+            if i + n > len(tokens): continue  # The slice would be shorter, and could equal a shorter term
+            for t in self.ngrams.get(tuple(tokens[i:i + n]), ()):
+                yield n, t
+
+    # Generates (start, end, term) for every match in a document given as a sequence of text chunks, the same
+    # matches as iterMatches finds in the whole text. The text is tokenized up to the last blank line received,
+    # which no token runs across, so only about a chunk of it is held at a time. The last few tokens are held
+    # back until more have been read, so terms that run on past a blank line are still matched.
+    # With markChunks, (offset, offset, None) is also generated after each chunk. Every match generated after
+    # it starts at or after offset.
+    def iterChunkMatches(self, chunks, markChunks=False):
+        keep = max(self.lengths, default=1) - 1  # The tokens a match starting before them could run into
+        buffered, offset = '', 0  # The text that hasn't been tokenized yet, and its offset
+        tokens, starts, ends = [], [], []  # The tokens that matches haven't been looked for from yet
+        base = 0  # The number of tokens before tokens[0]
+        nextStarts = [0] * len(self.terms)  # As in iterMatches, but counting from the start of the document
+
+        def tokenize(length):
+            index = TokenIndex(buffered[:length], self.tokenize)
+            tokens.extend(index.foldedTokens() if self.foldCase else index.tokens)
+            starts.extend(start + offset for start in index.starts)
+            ends.extend(end + offset for end in index.ends)
+
+        def matchFrom(count):
+            nonlocal base
+            for i in range(count):
+                if tokens[i] not in self.firstTokens: continue
+                for n, t in self.matchesAt(tokens, i):
+                    if nextStarts[t] > base + i: continue
+                    nextStarts[t] = base + i + n
+                    yield starts[i], ends[i + n - 1], self.terms[t]
+            del tokens[:count], starts[:count], ends[:count]
+            base += count
+
+        for chunk in chunks:
+            searchFrom = max(len(buffered) - 1, 0)  # A blank line may straddle two chunks
+            buffered += chunk
+            cut = buffered.rfind('\n\n', searchFrom)
+            if cut >= 0:
+                tokenize(cut + 2)
+                buffered, offset = buffered[cut + 2:], offset + cut + 2
+                yield from matchFrom(max(len(tokens) - keep, 0))
+            if markChunks:
+                mark = starts[0] if tokens else offset
+                yield mark, mark, None
+        tokenize(len(buffered))
+        yield from matchFrom(len(tokens))
+
+    # Every match generated after one of iterChunkMatches's marks starts later than its offset - markLag
+    markLag = 1
+
+    # Returns a dict of term -> list of (start, end) spans, covering every term
+    @timed('tokenMatcher.findAll')
+    def findAll(self, target):
+        spans = {t: [] for t in self.terms}
+        for start, end, term in self.iterMatches(target):
+            spans[term].append((start, end))
+        return spans
+
+    def __str__(self):
+        return "Class TokenMatcher terms: %d, n-grams: %d" % (len(self.terms), len(self.ngrams))
@@ -0,0 +1,113 @@
+import sys, time, random, tracemalloc
+import NLTKWordAnalysis
+from NLTKWordAnalysis import WordRecord, WordAnalysisCache, AnalyzedWords
+from bench_suite import ENGLISH_WORDS, syntheticWords
+
+# Measures the memory and time of analyzing a selection of words, two passes over it.
+#
+# The first comparison needs no NLTK: the caches are filled with made up records, so only the analysis layer
+# itself is measured. "Per token" is the old layout - a dict record per word and a WordAnalysis with a __dict__
+# per token, made by a one-shot map that has to be made again for a second pass. "Per unique" is AnalyzedWords:
+# slotted records and a slotted WordAnalysis per distinct (word, tag), shared by every repeat.
+# If NLTK is installed, a real TextAnalysis of the selection is measured too.
+#
+# Usage: python3 bench_analysis_memory.py [tokens] [distinct words]
+
+DEFAULT_TOKENS = 10000
+DEFAULT_DISTINCT = 2000
+TAGS = ['NN', 'NNS', 'JJ', 'VB']
+
+
+# The old WordAnalysis: an instance __dict__, with some of the record copied into it
+class PerTokenWordAnalysis:
+    def __init__(self, word, tag, cache):
+        self.word = word
+        self.tag = tag
+        self.analysis = cache.get(word, None)
+        self.singular = self.analysis['singular']
+        self.plural = self.analysis['plural']
+        self.numSynsets = self.analysis['numSynsets']
+
+
+def syntheticRecord(rng, word):
+    lemmas = lambda n: ['%s_%d' % (word, i) for i in range(n)]
+    return {'singular': word, 'plural': word + 's', 'numSynsets': 3, 'synonyms': lemmas(3), 'hypernyms': lemmas(4),
+            'hyponyms': lemmas(6), 'definition': 'a definition of ' + word,
+            'definitions': ['%s: definition %d of %s' % (word, i, word) for i in range(3)],
+            'allSynonyms': lemmas(6), 'allHypernyms': lemmas(8), 'allHyponyms': lemmas(12)}
+
+
+# Returns (result, seconds, peak bytes, bytes still allocated when f returns).
+# f is run twice: once timed, and once with tracemalloc, which slows it down.
+def measure(f):
+    start = time.perf_counter()
+    f()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    result = f()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak, current
+
+
+def report(name, elapsed, peak, current):
+    print("%-22s %9.1fms  peak %8.1fKB  retained %8.1fKB" % (name, elapsed * 1000, peak / 1024, current / 1024))
+
+
+def compareLayouts(tokens, distinct):
+    rng = random.Random(1)
+    vocabulary = syntheticWords(rng, distinct)
+    words = [rng.choice(vocabulary) for i in range(tokens)]
+    wordTags = {word: rng.choice(TAGS) for word in vocabulary}  # Most words are nearly always tagged the same way
+    tags = [wordTags[word] if rng.random() < 0.9 else rng.choice(TAGS) for word in words]
+    records = {word: syntheticRecord(rng, word) for word in vocabulary}
+
+    def perToken():
+        # As they come out of the cache's JSON
+        cache = {word: {k: list(v) if isinstance(v, list) else v for k, v in record.items()} for word, record in records.items()}
+        analyses = []
+        for npass in range(2):  # The map is exhausted after one pass, so it has to be made again
+            analyses = list(map(lambda w, t: PerTokenWordAnalysis(w, t, cache), words, tags))
+        return cache, analyses
+
+    def perUnique():
+        cache = WordAnalysisCache(maxsize=distinct)
+        for word, record in records.items():
+            cache.remember(word, WordRecord.fromDict(record))
+        analyzedWords = AnalyzedWords(words, tags, cache)
+        for npass in range(2):
+            for aw in analyzedWords:
+                aw.singular
+        return cache, analyzedWords
+
+    print("%d tokens, %d distinct words, two passes" % (tokens, distinct))
+    report('Per token', *measure(perToken)[1:])
+    report('Per unique', *measure(perUnique)[1:])
+
+
+def measureTextAnalysis(tokens):
+    try:
+        NLTKWordAnalysis.loadNLTK()
+        NLTKWordAnalysis.warmUp()
+    except ImportError as e:
+        print("TextAnalysis skipped: %s" % e)
+        return
+    rng = random.Random(1)
+    text = ' '.join(rng.choice(ENGLISH_WORDS) + ('.' if rng.random() < 0.1 else '') for i in range(tokens))
+
+    def analyze():
+        t = NLTKWordAnalysis.TextAnalysis(text)
+        for npass in range(2):
+            for aw in t.analyzedWords:
+                aw.definition
+        return t
+
+    analyze()  # So that every word is in the analysis cache, as after the first exploration
+    report('TextAnalysis', *measure(analyze)[1:])
+
+
+if __name__ == '__main__':
+    tokens = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_TOKENS
+    distinct = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_DISTINCT
+    compareLayouts(tokens, distinct)
+    measureTextAnalysis(tokens)
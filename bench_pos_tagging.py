@@ -0,0 +1,46 @@
+import os, sys, time
+import nltk
+from nltk import word_tokenize
+
+# Compares tagging words one at a time (the old WordAnalysis.pos path) with tagging the
+# whole token sequence in one batched call (the TextAnalysis path).
+#
+# Usage: python3 bench_pos_tagging.py [textfile] [repeats]
+
+DEFAULT_TEXT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'TESTProject', 'OLASVisionStatement.txt')
+
+
+def perWordTags(words):
+    return [nltk.pos_tag([w])[0][1] for w in words]
+
+
+def batchedTags(words):
+    return [tag for w, tag in nltk.pos_tag(words)]
+
+
+def timeIt(f, words, repeats):
+    best = None
+    for i in range(repeats):
+        start = time.perf_counter()
+        result = f(words)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+if __name__ == '__main__':
+    fname = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_TEXT
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    with open(fname, 'r') as f:
+        words = word_tokenize(f.read())
+    nltk.pos_tag(['warm', 'up'])  # Don't count loading the tagger
+
+    perWordTime, perWord = timeIt(perWordTags, words, repeats)
+    batchedTime, batched = timeIt(batchedTags, words, repeats)
+    agree = sum(1 for a, b in zip(perWord, batched) if a == b)
+
+    print("%d tokens, best of %d" % (len(words), repeats))
+    print("Per word: %.4fs (%.1f us/token)" % (perWordTime, perWordTime * 1e6 / max(len(words), 1)))
+    print("Batched:  %.4fs (%.1f us/token)" % (batchedTime, batchedTime * 1e6 / max(len(words), 1)))
+    print("Speedup:  %.1fx" % (perWordTime / batchedTime if batchedTime else float('inf')))
+    print("Tags that change with sentence context: %d of %d" % (len(words) - agree, len(words)))
@@ -0,0 +1,102 @@
+import os, sys, json, time, random, argparse, threading, statistics, urllib.request
+from bench_suite import syntheticWords, syntheticDocument
+from Highlighter import HighlighterSet
+from HighlightService import HighlightServer
+
+# A load generator for HighlightService. It sends highlight requests from several client threads
+# and reports the throughput and the latency percentiles.
+# Without --url it starts a service on a free local port for the project, and stops it afterwards.
+#
+# Usage: python3 bench_service.py [project] [--url http://127.0.0.1:8642] [-r requests] [-c clients]
+#                                 [-d documents per request] [-w words per document] [-j jobs]
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PROJECT = os.path.join(HERE, 'TESTProject')
+
+
+def post(url, body):
+    request = urllib.request.Request(url + '/highlight', data=json.dumps(body).encode('utf-8'),
+                                     headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read().decode('utf-8'))
+
+
+# Documents made of the project's own terms mixed with made up words, so there is plenty to match
+def makeDocuments(project, count, words, seed=1):
+    rng = random.Random(seed)
+    highlighterSet = HighlighterSet(project)
+    terms = [t for name in highlighterSet.highlighterNames for t in highlighterSet.getHighlighter(name).terms if t]
+    vocabulary = syntheticWords(rng, 2000)
+    return [syntheticDocument(rng, vocabulary, terms, words) for i in range(count)]
+
+
+# Sends requests highlight requests from clients threads. Returns the latencies in seconds and the elapsed time.
+def generateLoad(url, project, documents, requests, clients, perRequest):
+    latencies = []
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def client():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None: return
+            batch = [documents[(i * perRequest + j) % len(documents)] for j in range(perRequest)]
+            start = time.perf_counter()
+            post(url, {'project': project, 'documents': batch})
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+
+    post(url, {'project': project, 'documents': documents[:1]})  # Warm up: compile the matchers
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client) for i in range(clients)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    return latencies, time.perf_counter() - start
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure the throughput and latency of HighlightService.')
+    parser.add_argument('project', nargs='?', default=DEFAULT_PROJECT, help='project directory (default: TESTProject)')
+    parser.add_argument('--url', help='a running service, whose root contains the project (default: start one)')
+    parser.add_argument('-r', '--requests', type=int, default=200, help='requests to send (default: %(default)s)')
+    parser.add_argument('-c', '--clients', type=int, default=8, help='concurrent clients (default: %(default)s)')
+    parser.add_argument('-d', '--documents', type=int, default=4, help='documents per request (default: %(default)s)')
+    parser.add_argument('-w', '--words', type=int, default=2000, help='words per document (default: %(default)s)')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='worker processes of the started service')
+    args = parser.parse_args(argv)
+
+    documents = makeDocuments(args.project, max(args.documents * 4, 16), args.words)
+    server = None
+    if args.url:
+        url, project = args.url, os.path.basename(os.path.normpath(args.project))
+    else:
+        root, project = os.path.split(os.path.abspath(os.path.normpath(args.project)))
+        server = HighlightServer(root, port=0, jobs=args.jobs)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = server.url
+    try:
+        latencies, elapsed = generateLoad(url, project, documents, args.requests, args.clients, args.documents)
+    finally:
+        if server:
+            server.shutdown()
+            server.server_close()
+
+    characters = sum(len(d) for d in documents) / len(documents) * args.documents * len(latencies)
+    print("%d requests of %d documents from %d clients in %.2fs" % (len(latencies), args.documents, args.clients, elapsed))
+    print("Throughput: %.1f requests/s, %.1f documents/s, %.2f MB/s" %
+          (len(latencies) / elapsed, len(latencies) * args.documents / elapsed, characters / elapsed / 1e6))
+    print("Latency:    p50 %.1fms, p90 %.1fms, p99 %.1fms, max %.1fms" %
+          tuple(x * 1000 for x in (statistics.median(latencies), percentile(latencies, 0.9),
+                                   percentile(latencies, 0.99), max(latencies))))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
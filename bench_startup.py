@@ -0,0 +1,46 @@
+import os, sys, subprocess, statistics
+
+# Measures application startup time. Each run is a fresh interpreter, so nothing is already imported.
+# The import phase is always measured. If there is a display, building the main window and drawing
+# it (up to the first idle) is measured too.
+#
+# Usage: python3 bench_startup.py [runs]
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+STARTUP_SCRIPT = '''
+import sys, time
+start = time.perf_counter()
+import AdvancedSemanticHighlighterApp
+imported = time.perf_counter()
+window = -1.0
+if %(gui)r:
+    root = AdvancedSemanticHighlighterApp.Tk()
+    app = AdvancedSemanticHighlighterApp.AdvancedSemanticHighlighterApp()
+    root.update()
+    window = time.perf_counter() - imported
+    root.destroy()
+print(imported - start, window, 'nltk' in sys.modules)
+'''
+
+
+def startupTimes(gui):
+    env = dict(os.environ, ASH_NLTK_WARMUP='0')  # Time the startup itself, not the warm up
+    output = subprocess.check_output([sys.executable, '-c', STARTUP_SCRIPT % {'gui': gui}], cwd=HERE, env=env)
+    importTime, windowTime, nltkImported = output.decode().split()
+    return float(importTime), float(windowTime), nltkImported == 'True'
+
+
+def report(name, times):
+    print("%-8s median %.1fms, min %.1fms, max %.1fms" %
+          (name, statistics.median(times) * 1000, min(times) * 1000, max(times) * 1000))
+
+
+if __name__ == '__main__':
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    gui = bool(os.environ.get('DISPLAY')) or sys.platform in ('darwin', 'win32')
+    results = [startupTimes(gui) for i in range(runs)]
+    print("%d runs" % runs)
+    report('Import', [r[0] for r in results])
+    if gui: report('Window', [r[1] for r in results])
+    print("NLTK imported at startup: %s" % any(r[2] for r in results))
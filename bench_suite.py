@@ -0,0 +1,292 @@
+import os, re, sys, time, json, random, tempfile, argparse, platform, statistics, subprocess
+from Highlighter import *
+from TermMatcher import *
+from TokenIndex import *
+import NLTKWordAnalysis
+from AdvancedSemanticHighlighterApp import HighlightText, DEFAULT_TAG
+
+# A reproducible benchmark suite for the hot paths: loading and editing highlighters, building a
+# HighlighterSet, matching and tagging terms in a document, and analysing words with NLTK/WordNet.
+# Documents and highlighters are generated from a seeded random number generator, so every run
+# measures the same work. Results are written as JSON, and can be compared with an earlier run:
+#
+#   python3 bench_suite.py -o before.json
+#   ... change something ...
+#   python3 bench_suite.py -o after.json --compare before.json
+#
+# Usage: python3 bench_suite.py [-o results.json] [--compare baseline.json] [--scale 1.0] [--repeats 5]
+#                               [--seed 1] [--only name ...] [--threshold 0.1]
+
+DEFAULT_SCALE = 1.0
+DEFAULT_REPEATS = 5
+DEFAULT_SEED = 1
+TAG_ALL_TERMS = 20  # Terms tagged one at a time by the tagAll benchmark
+REGRESSION_THRESHOLD = 0.1  # A benchmark that is more than 10% slower than the baseline is a regression
+
+# Real words, so that WordNet has something to find, mixed with made up ones
+ENGLISH_WORDS = ['library', 'book', 'university', 'archive', 'collection', 'reader', 'student', 'research',
+                 'catalogue', 'manuscript', 'journal', 'study', 'record', 'history', 'science', 'language',
+                 'service', 'building', 'room', 'search', 'report', 'document', 'paper', 'letter', 'map',
+                 'black', 'orange', 'open', 'public', 'digital', 'rare', 'special', 'old', 'new', 'local']
+SYLLABLES = ['ka', 'to', 'mi', 'ne', 'ru', 'sa', 'lo', 'vi', 'ber', 'tan', 'gor', 'del', 'ish', 'on', 'ex']
+
+
+# Generates a vocabulary of distinct words
+def syntheticWords(rng, count):
+    words = list(ENGLISH_WORDS[:count])
+    seen = set(words)
+    while len(words) < count:
+        word = ''.join(rng.choice(SYLLABLES) for i in range(rng.randint(2, 4)))
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    return words
+
+
+# Generates distinct terms of one to three words, as highlighter terms usually are
+def syntheticTerms(rng, vocabulary, count):
+    terms = set()
+    while len(terms) < count:
+        words = rng.sample(vocabulary, rng.choice((1, 1, 2, 3)))
+        terms.add(' '.join(words).capitalize() if rng.random() < 0.2 else ' '.join(words))
+    return sorted(terms)
+
+
+# Generates a document of about wordCount words, with lines of about a dozen words, in which some of the terms occur
+def syntheticDocument(rng, vocabulary, terms, wordCount, termRate=0.05):
+    words = []
+    while len(words) < wordCount:
+        if terms and rng.random() < termRate:
+            words.append(rng.choice(terms))
+        else:
+            words.append(rng.choice(vocabulary))
+        words.append('\n' if rng.random() < 1 / 12 else ' ')
+    return ''.join(words)
+
+
+# Writes a .hil file, and returns its file name
+def writeHighlighter(directory, name, terms):
+    fname = os.path.join(directory, name + HIGHLIGHTER_EXT)
+    with open(fname, 'w') as f:
+        f.write(name + '\nwhite\nblue\n')
+        for term in terms:
+            f.write(term + '\n')
+    return fname
+
+
+def simpleTokenize(text):
+    return re.findall(r"\w+|[^\w\s]", text)
+
+
+# A HighlightText without Tk. The text is a string, and tag operations are counted rather than drawn,
+# so the matching and index conversion that HighlightText does can be timed without a display.
+class HeadlessText(HighlightText):
+    def __init__(self, text):
+        self.text = text
+        self._initState()
+        self.tags = {}  # tag -> number of ranges added
+
+    def get(self, index1, index2=None):
+        return self.text
+
+    def tag_add(self, tag, *indices):
+        self.tags[tag] = self.tags.get(tag, 0) + len(indices) // 2
+
+    def tag_remove(self, tag, *indices):
+        pass
+
+    def tag_names(self, index=None):
+        return tuple(self.tags)
+
+    def tag_delete(self, *tags):
+        for tag in tags:
+            self.tags.pop(tag, None)
+
+    def after_idle(self, f, *args):
+        return None
+
+
+# Runs f repeats times and returns its timings in seconds
+def measure(f, repeats):
+    times = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        f()
+        times.append(time.perf_counter() - start)
+    return {'best': min(times), 'median': statistics.median(times), 'repeats': repeats}
+
+
+# Each benchmark function generates its inputs and returns a dict of name -> (function to time, size, unit)
+
+def highlighterBenchmarks(rng, scale, directory):
+    vocabulary = syntheticWords(rng, int(5000 * scale))
+    terms = syntheticTerms(rng, vocabulary, int(20000 * scale))
+    fname = writeHighlighter(directory, 'Large', terms)
+    shuffled = terms[:]
+    rng.shuffle(shuffled)
+
+    def addTerms():
+        h = Highlighter(fname, load=False)
+        for term in shuffled:
+            h.addTerm(term)
+
+    return {'highlighter.load': (lambda: Highlighter(fname), len(terms), 'terms'),
+            'highlighter.addTerm': (addTerms, len(terms), 'terms')}
+
+
+def highlighterSetBenchmarks(rng, scale, directory):
+    directory = os.path.join(directory, 'project')
+    os.mkdir(directory)
+    vocabulary = syntheticWords(rng, 2000)
+    count = max(int(200 * scale), 1)
+    for i in range(count):
+        writeHighlighter(directory, 'Highlighter%d' % i, syntheticTerms(rng, vocabulary, 500))
+
+    def construct():
+        highlighterCache.clear()  # Time a project being opened for the first time
+        HighlighterSet(directory)
+
+    def loadAll():
+        highlighterCache.clear()
+        highlighterSet = HighlighterSet(directory)
+        for name in highlighterSet.highlighterNames:
+            highlighterSet.getHighlighter(name)
+
+    return {'highlighterSet.construct': (construct, count, 'highlighters'),
+            'highlighterSet.loadAll': (loadAll, count, 'highlighters')}
+
+
+def matchingBenchmarks(rng, scale, directory):
+    vocabulary = syntheticWords(rng, 5000)
+    terms = syntheticTerms(rng, vocabulary, int(2000 * scale))
+    text = syntheticDocument(rng, vocabulary, terms, int(200000 * scale))
+
+    def tagAllList():
+        HeadlessText(text).tagAllList(terms, DEFAULT_TAG)
+
+    # Adding terms one at a time, as highlightSelection does
+    def tagAll():
+        headlessText = HeadlessText(text)
+        for term in terms[:TAG_ALL_TERMS]:
+            headlessText.tagAll(term, DEFAULT_TAG)
+
+    # Whole word matching, with a regular expression tokenizer so NLTK isn't needed
+    def tokenMatcher():
+        TokenMatcher(terms, tokenize=simpleTokenize).findAll(TokenIndex(text, simpleTokenize))
+
+    def highlighterMatcher():
+        HighlighterMatcher({'A': terms[::2], 'B': terms[1::2], 'C': terms[::3]}).findAll(text)
+
+    return {'termMatcher.build': (lambda: TermMatcher(terms), len(terms), 'terms'),
+            'highlightText.tagAllList': (tagAllList, len(text), 'chars'),
+            'highlightText.tagAll': (tagAll, TAG_ALL_TERMS, 'terms'),
+            'highlighterMatcher.findAll': (highlighterMatcher, len(text), 'chars'),
+            'tokenMatcher.findAll': (tokenMatcher, len(text), 'chars')}
+
+
+# Needs NLTK and its data. The words come from ENGLISH_WORDS, so most of them are in WordNet.
+def analysisBenchmarks(rng, scale, directory):
+    NLTKWordAnalysis.loadNLTK()
+    NLTKWordAnalysis.ensureWordNetLoaded()
+    vocabulary = syntheticWords(rng, len(ENGLISH_WORDS))
+    text = syntheticDocument(rng, vocabulary, [], int(5000 * scale)).replace('\n', '. ')
+    words = sorted(set(NLTKWordAnalysis.word_tokenize(text)))
+    warmCache = NLTKWordAnalysis.WordAnalysisCache()
+    for word in words:
+        NLTKWordAnalysis.WordAnalysis(word, cache=warmCache)
+
+    def analyzeWords(cache):
+        for word in words:
+            NLTKWordAnalysis.WordAnalysis(word, cache=cache)
+
+    return {'textAnalysis': (lambda: NLTKWordAnalysis.TextAnalysis(text), len(text.split()), 'words'),
+            'wordAnalysis.uncached': (lambda: analyzeWords(NLTKWordAnalysis.WordAnalysisCache()), len(words), 'words'),
+            'wordAnalysis.cached': (lambda: analyzeWords(warmCache), len(words), 'words')}
+
+
+# The benchmark groups, with the names of the benchmarks each returns, so --only doesn't generate the inputs
+# of groups it leaves out
+BENCHMARK_GROUPS = [
+    (highlighterBenchmarks, ['highlighter.load', 'highlighter.addTerm']),
+    (highlighterSetBenchmarks, ['highlighterSet.construct', 'highlighterSet.loadAll']),
+    (matchingBenchmarks, ['termMatcher.build', 'highlightText.tagAllList', 'highlightText.tagAll',
+                          'highlighterMatcher.findAll', 'tokenMatcher.findAll']),
+    (analysisBenchmarks, ['textAnalysis', 'wordAnalysis.uncached', 'wordAnalysis.cached'])]
+
+
+# The commit being measured, if this is a git checkout
+def gitCommit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Runs the benchmarks (or just those whose names start with one of only) and returns the results
+def runSuite(scale=DEFAULT_SCALE, repeats=DEFAULT_REPEATS, seed=DEFAULT_SEED, only=None, log=None):
+    results = {}
+    selected = lambda name: not only or any(name.startswith(o) for o in only)
+    with tempfile.TemporaryDirectory() as directory:
+        for group, names in BENCHMARK_GROUPS:
+            if not any(selected(name) for name in names): continue
+            # Every group gets its own generator, so adding a group doesn't change the inputs of the others
+            rng = random.Random('%s:%s' % (seed, group.__name__))
+            try:
+                benchmarks = group(rng, scale, directory)
+            except (ImportError, LookupError) as e:  # NLTK or its data isn't installed
+                if log: log("%-28s skipped: %s" % (group.__name__, str(e).strip().splitlines()[0]))
+                continue
+            for name, (f, size, unit) in benchmarks.items():
+                if not selected(name): continue
+                result = measure(f, repeats)
+                result.update({'size': size, 'unit': unit, 'perSecond': size / result['best'] if result['best'] else None})
+                results[name] = result
+                if log: log("%-28s %9.2fms  %12.0f %s/s" % (name, result['best'] * 1000, result['perSecond'] or 0, unit))
+    highlighterCache.clear()
+    return {'commit': gitCommit(), 'date': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(),
+            'platform': platform.platform(), 'scale': scale, 'repeats': repeats, 'seed': seed, 'results': results}
+
+
+# Compares the best times of two runs. Returns a list of (name, baseline seconds, seconds, ratio, regression).
+def compareResults(baseline, current, threshold=REGRESSION_THRESHOLD):
+    comparison = []
+    for name, result in sorted(current['results'].items()):
+        old = baseline['results'].get(name)
+        if not old or old['size'] != result['size'] or not old['best']: continue  # Not comparable
+        ratio = result['best'] / old['best']
+        comparison.append((name, old['best'], result['best'], ratio, ratio > 1 + threshold))
+    return comparison
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark highlighter loading, matching, tagging and word analysis.')
+    parser.add_argument('-o', '--output', help='JSON results file')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare with')
+    parser.add_argument('--scale', type=float, default=DEFAULT_SCALE, help='multiplies the input sizes (default: %(default)s)')
+    parser.add_argument('--repeats', type=int, default=DEFAULT_REPEATS, help='runs of each benchmark (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help='random seed for the inputs (default: %(default)s)')
+    parser.add_argument('--only', nargs='*', help='run just the benchmarks whose names start with these')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help='slowdown that counts as a regression (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    current = runSuite(args.scale, args.repeats, args.seed, args.only, log=print)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2)
+    if not args.compare: return 0
+    with open(args.compare, 'r') as f:
+        baseline = json.load(f)
+    if (baseline['scale'], baseline['seed']) != (current['scale'], current['seed']):
+        print("Warning: the baseline was run with a different scale or seed")
+    print("\nCompared with %s (%s):" % (args.compare, baseline.get('commit')))
+    regressions = 0
+    for name, old, new, ratio, regression in compareResults(baseline, current, args.threshold):
+        regressions += regression
+        print("%-28s %9.2fms -> %9.2fms  %5.2fx%s" % (name, old * 1000, new * 1000, ratio, '  REGRESSION' if regression else ''))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
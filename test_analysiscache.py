@@ -0,0 +1,43 @@
+from AnalysisCache import *
+import tempfile
+import unittest
+
+class TestAnalysisCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.analyzed = []
+        self.RECORD = {'synonyms': ['dog', 'domestic_dog'], 'pos': 'Noun, singular or mass'}
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def analyze(self, word):
+        self.analyzed.append(word)
+        return self.RECORD
+
+    def test_memoizes(self):
+        cache = AnalysisCache()
+        self.assertEqual(cache.get('dog', self.analyze), self.RECORD)
+        self.assertEqual(cache.get('dog', self.analyze), self.RECORD)
+        self.assertEqual(self.analyzed, ['dog'])
+
+    def test_lruEviction(self):
+        cache = AnalysisCache(maxsize=2)
+        for word in ['a', 'b', 'a', 'c']:
+            cache.get(word, self.analyze)
+        # 'b' was the least recently used
+        self.assertEqual(list(cache.entries.keys()), ['a', 'c'])
+
+    def test_persistence(self):
+        cache = AnalysisCache(self.directory.name)
+        cache.get('dog', self.analyze)
+        cache.close()
+        self.assertTrue(os.path.exists(os.path.join(self.directory.name, ANALYSIS_CACHE_FILE)))
+        # A new session finds the analysis without analyzing again
+        cache = AnalysisCache(self.directory.name)
+        self.assertEqual(cache.get('dog', self.analyze), self.RECORD)
+        self.assertEqual(self.analyzed, ['dog'])
+        cache.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+from AnnotatedExport import *
+import re
+from html import unescape
+import tempfile
+import unittest
+
+class TestAnnotatedExport(unittest.TestCase):
+    def setUp(self):
+        self.TESTDIR = os.path.join(os.getcwd(), 'TESTProject')
+        self.TEXT = os.path.join(self.TESTDIR, 'OLASVisionStatement.txt')
+        with open(self.TEXT, 'r') as f:
+            self.text = f.read()
+        highlighterSet = HighlighterSet(self.TESTDIR)
+        self.highlighters = [highlighterSet.getHighlighter(name) for name in sorted(highlighterSet.highlighterNames)]
+        self.names = [h.name for h in self.highlighters]
+        self.matcher = makeMatcher(self.highlighters)
+
+    # Small chunks, so that matches straddle chunk boundaries
+    def events(self):
+        return iterMatchEvents(Document(self.TEXT, chunkSize=7).iterChunks(), self.matcher)
+
+    def test_matchEvents(self):
+        matches = [value for kind, value in self.events() if kind == MATCH]
+        self.assertEqual(matches, sorted(matches))
+        expected = sorted((s, e, name, term) for name, termSpans in self.matcher.findAll(self.text).items()
+                          for term, spans in termSpans.items() for s, e in spans)
+        self.assertEqual(matches, expected)
+
+    def test_segments(self):
+        segments = list(iterSegments(self.events(), self.names))
+        self.assertEqual(''.join(text for text, names, terms in segments), self.text)
+        start = self.text.index('Miskatonic University')
+        offset = 0
+        for text, names, terms in segments:
+            if offset <= start < offset + len(text):
+                self.assertIn(('Term', 'Miskatonic University'), terms)
+            offset += len(text)
+
+    def test_overlappingMatches(self):
+        events = iterMatchEvents(['aa bb', 'b'], HighlighterMatcher({'A': ['a bb'], 'B': ['bbb', 'aa']}))
+        segments = [(text, names) for text, names, terms in iterSegments(events, ['A', 'B'])]
+        self.assertEqual(segments, [('a', ['B']), ('a', ['A', 'B']), (' ', ['A']), ('bb', ['A', 'B']), ('b', ['B'])])
+
+    def test_exportDocument(self):
+        with tempfile.TemporaryDirectory() as directory:
+            htmlFname = os.path.join(directory, 'out.html')
+            jsonFname = os.path.join(directory, 'out.json')
+            exportDocument(self.TEXT, self.highlighters, htmlFname, jsonFname)
+            with open(htmlFname) as f:
+                html = f.read()
+            with open(jsonFname) as f:
+                spans = json.load(f)
+        body = html[html.index('<pre>') + 5:html.index('</pre>')]
+        self.assertEqual(unescape(re.sub('<[^>]*>', '', body)), self.text)
+        term = self.highlighters[self.names.index('Term')]
+        self.assertIn('color: %s; background-color: %s' % (cssColor(term.foreground), cssColor(term.background)), html)
+        self.assertEqual(spans['highlighters']['Term']['background'], term.background)
+        self.assertIn({'highlighter': 'Term', 'term': 'Miskatonic University', 'start': self.text.index('Miskatonic University'),
+                       'end': self.text.index('Miskatonic University') + len('Miskatonic University')}, spans['spans'])
+
+    def test_wholeWords(self):
+        tokenize = lambda text: re.findall(r"\w+|[^\w\s]", text)
+        matcher = makeMatcher(self.highlighters, {'wholeWords': True, 'tokenize': tokenize})
+        events = iterMatchEvents(Document(self.TEXT, chunkSize=7).iterChunks(), matcher)
+        matches = [value for kind, value in events if kind == MATCH]
+        self.assertEqual(matches, sorted(matches))
+        expected = sorted((s, e, name, term) for name, termSpans in matcher.findAll(self.text).items()
+                          for term, spans in termSpans.items() for s, e in spans)
+        self.assertEqual(matches, expected)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+from BackgroundTasks import *
+from concurrent.futures import wait
+import unittest
+
+# Stands in for a Tk widget. after() just remembers the callback, and the test runs it.
+class FakeWidget:
+    def __init__(self):
+        self.pending = {}
+
+    def after(self, ms, f):
+        self.pending[len(self.pending) + 1] = f
+        return len(self.pending)
+
+    def after_cancel(self, id):
+        self.pending.pop(id, None)
+
+class TestBackgroundTasks(unittest.TestCase):
+    def setUp(self):
+        self.widget = FakeWidget()
+        self.tasks = BackgroundTasks(self.widget)
+        self.results = []
+
+    def finish(self, future):
+        wait([future], timeout=5)
+        self.tasks.poll()
+
+    def test_resultsArriveOnPoll(self):
+        future = self.tasks.submit(self.results.append, sum, [1, 2, 3])
+        self.assertTrue(self.widget.pending)
+        self.finish(future)
+        self.assertEqual(self.results, [6])
+
+    def test_errback(self):
+        future = self.tasks.submit(self.results.append, int, 'not a number', errback=self.results.append)
+        self.finish(future)
+        self.assertIsInstance(self.results[0], ValueError)
+
+    def test_cancel(self):
+        future = self.tasks.submit(self.results.append, sum, [1, 2, 3])
+        self.tasks.cancel()
+        self.assertIsNone(self.tasks.submit(self.results.append, sum, [4]))
+        self.finish(future)
+        self.assertEqual(self.results, [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+from BatchHighlighter import *
+import shutil
+import tempfile
+import unittest
+
+class TestBatchHighlighter(unittest.TestCase):
+    def setUp(self):
+        self.TESTDIR = os.path.join(os.getcwd(), 'TESTProject')
+        self.TEXT = os.path.join(self.TESTDIR, 'OLASVisionStatement.txt')
+        with open(self.TEXT, 'r') as f:
+            self.text = f.read()
+
+    def test_highlightProject(self):
+        reports = list(highlightProject(self.TESTDIR, jobs=1))
+        self.assertEqual([r['document'] for r in reports], [self.TEXT])
+        matches = reports[0]['matches']
+        self.assertTrue(matches)
+        for m in matches:
+            self.assertEqual(self.text[m['start']:m['end']], m['term'])
+        self.assertIn({'highlighter': 'Term', 'term': 'Miskatonic University',
+                       'start': self.text.index('Miskatonic University'),
+                       'end': self.text.index('Miskatonic University') + len('Miskatonic University')}, matches)
+
+    def test_main(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'report.jsonl')
+            main([self.TESTDIR, '-o', output, '-j', '2'])
+            with open(output, 'r') as f:
+                reports = [json.loads(line) for line in f]
+        self.assertEqual(len(reports), 1)
+        self.assertEqual(reports[0]['document'], 'OLASVisionStatement.txt')
+        self.assertEqual(reports[0]['matches'], list(highlightProject(self.TESTDIR, jobs=1))[0]['matches'])
+
+    def test_undecodableDocument(self):
+        with tempfile.TemporaryDirectory() as directory:
+            project = os.path.join(directory, 'project')
+            shutil.copytree(self.TESTDIR, project)
+            with open(os.path.join(project, 'Latin1.txt'), 'wb') as f:
+                f.write('Caf\xe9 near Miskatonic University'.encode('latin-1'))
+            output = os.path.join(directory, 'report.jsonl')
+            self.assertEqual(main([project, '-o', output, '-j', '2', '-e', 'utf-8']), 1)
+            with open(output, 'r') as f:
+                reports = {r['document']: r for r in map(json.loads, f)}
+            # The bad document is reported, and the others are still highlighted
+            self.assertIn('UnicodeDecodeError', reports['Latin1.txt']['error'])
+            self.assertTrue(reports['OLASVisionStatement.txt']['matches'])
+            self.assertEqual(main([project, '-o', output, '-j', '1', '-e', 'latin-1']), 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+from bench_suite import *
+import bench_suite
+import unittest
+from unittest import mock
+
+class TestBenchSuite(unittest.TestCase):
+    def test_headlessTagAllList(self):
+        text = 'The Orne Library\nholds books. More books.'
+        headlessText = HeadlessText(text)
+        headlessText.tagAllList(['books', 'Library'], 'Term')
+        self.assertEqual(headlessText.termSpans['Term']['books'], [(23, 28), (35, 40)])
+        self.assertEqual(headlessText.tags['Term'], 3)
+
+    def test_generatorsAreReproducible(self):
+        def generate():
+            rng = random.Random(1)
+            vocabulary = syntheticWords(rng, 100)
+            terms = syntheticTerms(rng, vocabulary, 20)
+            return terms, syntheticDocument(rng, vocabulary, terms, 500)
+        self.assertEqual(generate(), generate())
+
+    def test_runAndCompare(self):
+        results = runSuite(scale=0.01, repeats=1, only=['highlighter.'])
+        self.assertEqual(sorted(results['results']), ['highlighter.addTerm', 'highlighter.load'])
+        slower = json.loads(json.dumps(results))
+        slower['results']['highlighter.load']['best'] *= 2
+        regressions = [c[0] for c in compareResults(results, slower) if c[4]]
+        self.assertEqual(regressions, ['highlighter.load'])
+
+    def test_onlyBuildsSelectedGroups(self):
+        def unselected(rng, scale, directory):
+            raise AssertionError('the inputs of an unselected group were generated')
+        groups = [(highlighterBenchmarks, ['highlighter.load', 'highlighter.addTerm']),
+                  (unselected, ['unselected.benchmark'])]
+        with mock.patch.object(bench_suite, 'BENCHMARK_GROUPS', groups):
+            results = runSuite(scale=0.01, repeats=1, only=['highlighter.load'])
+        self.assertEqual(sorted(results['results']), ['highlighter.load'])
+
+    def test_groupNames(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for group, names in BENCHMARK_GROUPS:
+                if group is analysisBenchmarks: continue  # Needs NLTK
+                self.assertEqual(sorted(group(random.Random(1), 0.01, directory)), sorted(names))
+
+if __name__ == "__main__":
+    unittest.main()
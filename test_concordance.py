@@ -0,0 +1,92 @@
+from Concordance import *
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+class TestConcordance(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.TESTDIR = self.directory.name
+        self.HIGHLIGHTER = os.path.join(self.TESTDIR, 'Resource.hil')
+        self.DOC_A = os.path.join(self.TESTDIR, 'a.txt')
+        self.DOC_B = os.path.join(self.TESTDIR, 'b.txt')
+        self.write(self.HIGHLIGHTER, 'Resource\nblack\norange\nbooks\nlibrary\n')
+        self.write(self.DOC_A, 'The library lends books. More books.\n')
+        self.write(self.DOC_B, 'No such things here.\n')
+        highlighterCache.clear()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, fname, text):
+        with open(fname, 'w') as f:
+            f.write(text)
+        # Make sure the modification time changes, even on file systems with coarse timestamps
+        st = os.stat(fname)
+        os.utime(fname, ns=(st.st_atime_ns, time.time_ns() + 10 ** 9))
+
+    def test_queries(self):
+        concordance = Concordance(self.TESTDIR)
+        self.assertEqual(concordance.frequency('books'), 2)
+        self.assertEqual(concordance.occurrences('library'), {self.DOC_A: [(4, 11)]})
+        self.assertEqual(concordance.termFrequencies('Resource'), {'books': 2, 'library': 1})
+        self.assertEqual(list(concordance.contexts('library', width=4)), [(self.DOC_A, 4, 'The library len')])
+
+    def test_refresh(self):
+        concordance = Concordance(self.TESTDIR)
+        self.write(self.DOC_B, 'Books? Just books.\n')
+        self.write(self.HIGHLIGHTER, 'Resource\nblack\norange\nbooks\nlends\nthings\n')
+        concordance.refresh()
+        self.assertEqual(concordance.documentFrequencies('books'), {self.DOC_A: 2, self.DOC_B: 1})
+        self.assertEqual(concordance.frequency('library'), 0)
+        self.assertEqual(concordance.frequency('things'), 0)
+        # A new term is found in a document that hasn't changed
+        self.assertEqual(concordance.occurrences('lends'), {self.DOC_A: [(12, 17)]})
+        os.remove(self.DOC_A)
+        concordance.refresh()
+        self.assertEqual(concordance.documents(), [self.DOC_B])
+        self.assertEqual(concordance.frequency('books'), 1)
+
+    def test_deleteDocumentThenAddTerm(self):
+        concordance = Concordance(self.TESTDIR)
+        os.remove(self.DOC_B)
+        self.write(self.HIGHLIGHTER, 'Resource\nblack\norange\nbooks\nlibrary\nlends\n')
+        concordance.refresh()
+        self.assertEqual(concordance.documents(), [self.DOC_A])
+        self.assertEqual(concordance.occurrences('lends'), {self.DOC_A: [(12, 17)]})
+        self.assertEqual(concordance.frequency('books'), 2)
+
+    def test_matcherOptions(self):
+        self.write(self.DOC_B, 'Library BOOK. Bookshelves.\n')
+        variants = lambda term: [term, term[:-1]] if term.endswith('s') else [term]
+        concordance = Concordance(self.TESTDIR, matcherOptions={'variants': variants, 'foldCase': True})
+        self.assertEqual(concordance.documentFrequencies('books'), {self.DOC_A: 2, self.DOC_B: 2})
+        tokenize = lambda text: text.replace('.', ' .').split()
+        concordance = Concordance(self.TESTDIR, matcherOptions={'variants': variants, 'foldCase': True,
+                                                                'wholeWords': True, 'tokenize': tokenize})
+        # Not inside "Bookshelves"
+        self.assertEqual(concordance.documentFrequencies('books'), {self.DOC_A: 2, self.DOC_B: 1})
+        self.assertEqual(concordance.documentFrequencies('library'), {self.DOC_A: 1, self.DOC_B: 1})
+
+    def test_undecodableDocument(self):
+        with open(os.path.join(self.TESTDIR, 'c.txt'), 'wb') as f:
+            f.write('Caf\xe9 books'.encode('latin-1'))
+        concordance = Concordance(self.TESTDIR)
+        # It is left out and reported, and the other documents are still indexed
+        self.assertEqual(concordance.documents(), [self.DOC_A, self.DOC_B])
+        self.assertIn('UnicodeDecodeError', concordance.failedDocuments()[os.path.join(self.TESTDIR, 'c.txt')])
+        self.assertEqual(concordance.frequency('books'), 2)
+        self.write(os.path.join(self.TESTDIR, 'c.txt'), 'Cafe books')
+        concordance.refresh()
+        self.assertEqual(concordance.failedDocuments(), {})
+        self.assertEqual(concordance.frequency('books'), 3)
+
+    def test_contextsAcrossChunks(self):
+        with mock.patch('Concordance.Document', lambda fname: Document(fname, chunkSize=3)):
+            self.assertEqual(list(Concordance(self.TESTDIR).contexts('books', width=4)),
+                             [(self.DOC_A, 18, 'nds books. Mo'), (self.DOC_A, 30, 'ore books. ')])
+        self.assertEqual(list(iterWindows(['abc', 'def', 'gh'], [(0, 2), (1, 5), (6, 20)])), ['ab', 'bcde', 'gh'])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,34 @@
+from Document import *
+from TermMatcher import TermMatcher
+import tempfile
+import unittest
+
+class TestDocument(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.fname = os.path.join(self.directory.name, 'document.txt')
+        self.TEXT = 'Miskatonic University\r\nholds books.\nThe Miskatonic University library.\n' * 10
+        with open(self.fname, 'w', newline='') as f:
+            f.write(self.TEXT)
+        with open(self.fname, 'r') as f:
+            self.text = f.read()  # With the newlines translated
+        self.matcher = TermMatcher(['Miskatonic University', 'books', 'library'])
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_iterChunks(self):
+        document = Document(self.fname, chunkSize=7)
+        chunks = list(document.iterChunks())
+        self.assertTrue(len(chunks) > 1)
+        self.assertEqual(''.join(chunks), self.text)
+        self.assertEqual(document.head(12), self.text[:12])
+
+    def test_matchesStraddleChunks(self):
+        # Small chunks split the terms, but the matches are the same as for the whole text
+        for chunkSize in [1, 5, 16, 1024]:
+            self.assertEqual(Document(self.fname, chunkSize=chunkSize).findAll(self.matcher),
+                             self.matcher.findAll(self.text))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,6 @@
 from Highlighter import *
+import shutil
+import tempfile
 import unittest
 
 class TestHighlighter(unittest.TestCase):
@@ -34,6 +36,13 @@ class TestHighlighter(unittest.TestCase):
         # Terms are added in alphabetical order
         self.assertEqual(h.terms, [self.TERM_A, self.TERM_B, self.TERM_C])
 
+    def test_addTerms(self):
+        h = Highlighter(self.TEST_LOAD_HIGHLIGHTER, load=False)
+        h.addTerm(self.TERM_B)
+        h.addTerms([self.TERM_C, self.TERM_A, self.TERM_B, self.TERM_A])
+        # Terms are merged in alphabetical order with no duplicates
+        self.assertEqual(h.terms, [self.TERM_A, self.TERM_B, self.TERM_C])
+
     def test_removeTerm(self):
         h = Highlighter(self.TEST_LOAD_HIGHLIGHTER)
         # Make test independent of Load
@@ -46,6 +55,16 @@ class TestHighlighter(unittest.TestCase):
         # Make test independent of Load
         h.terms = [self.TERM_A, self.TERM_B, self.TERM_C]
         self.assertTrue(h.containsTerm(self.TERM_C))
+        self.assertFalse(h.containsTerm('d term'))
+        self.assertEqual(h.indexOfTerm(self.TERM_B), 1)
+
+    def test_snapshot(self):
+        h = Highlighter(self.TEST_LOAD_HIGHLIGHTER)
+        snapshot = h.snapshot()
+        h.addTerm('d term')
+        self.assertEqual(snapshot.terms, [self.TERM_A, self.TERM_B, self.TERM_C])
+        self.assertEqual((snapshot.name, snapshot.foreground, snapshot.background),
+                         (self.LOAD_NAME, self.FOREGROUND, self.BACKGROUND))
 
     def test_save(self):
         h = Highlighter(self.TEST_SAVE_HIGHLIGHTER, load=False) # Don't autoload
@@ -72,6 +91,91 @@ class TestHighlighter(unittest.TestCase):
         self.assertEqual(h.name, self.LOAD_NAME)
         self.assertEqual(h.foreground, self.FOREGROUND)
         self.assertEqual(h.background, self.BACKGROUND)
+        self.assertEqual(h.terms, [self.TERM_A, self.TERM_B, self.TERM_C])
+
+class TestHighlighterJournal(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.TERM_FILE = os.path.join(self.directory.name, 'GA_OLASVisionStatement_Term.hil')
+        shutil.copy(os.path.join(os.getcwd(), 'TESTProject', 'GA_OLASVisionStatement_Term.hil'), self.TERM_FILE)
+        self.h = Highlighter(self.TERM_FILE)
+
+    def tearDown(self):
+        self.h.journal.discard()
+        self.directory.cleanup()
+
+    def readTerms(self):
+        with open(self.TERM_FILE, 'r') as f:
+            return [line.strip() for line in f.readlines()[3:]]
+
+    def test_journal(self):
+        savedTerms = self.readTerms()
+        self.h.addTermAndSave('Orne Library')
+        self.h.removeTermAndSave('Miskatonic University')
+        self.h.journal.flush()
+        # The edits are in the journal, not the .hil file, but loading replays them
+        self.assertEqual(self.readTerms(), savedTerms)
+        self.assertTrue(os.path.exists(self.TERM_FILE + JOURNAL_EXT))
+        replayed = Highlighter(self.TERM_FILE)
+        self.assertEqual(replayed.terms, self.h.terms)
+        replayed.journal.discard()
+
+    def test_replayedJournalIsCompacted(self):
+        self.h.addTermAndSave('Armitage Library')
+        self.h.journal.flush()
+        journalScheduler.cancel(self.h.journal)  # As if the program had crashed before compacting it
+        replayed = Highlighter(self.TERM_FILE)
+        self.assertIn((replayed.journal, 'compact'), journalScheduler.due)
+        self.assertIn(replayed.journal, openJournals)
+        replayed.journal.compact()
+        self.assertIn('Armitage Library', self.readTerms())
+        self.assertFalse(os.path.exists(self.TERM_FILE + JOURNAL_EXT))
+
+    def test_editsShareOneThread(self):
+        threads = threading.active_count()
+        for i in range(100):
+            self.h.addTermAndSave('term %d' % i)
+        self.assertLessEqual(threading.active_count(), threads + 1)
+
+    def test_compact(self):
+        self.h.addTermAndSave('Orne Library')
+        self.h.journal.compact()
+        # The .hil file now has every term, and the journal and temporary file are gone
+        self.assertEqual(self.readTerms(), self.h.terms)
+        self.assertIn('Orne Library', self.readTerms())
+        self.assertEqual(os.listdir(self.directory.name), ['GA_OLASVisionStatement_Term.hil'])
+
+class TestHighlighterSet(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.TESTDIR = self.directory.name
+        self.TERM_FILE = os.path.join(self.TESTDIR, 'GA_OLASVisionStatement_Term.hil')
+        shutil.copy(os.path.join(os.getcwd(), 'TESTProject', 'GA_OLASVisionStatement_Term.hil'), self.TERM_FILE)
+        highlighterCache.clear()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_lazyLoad(self):
+        hiSet = HighlighterSet(self.TESTDIR)
+        self.assertEqual(hiSet.highlighterNames, ['Term'])
+        # Only the header has been read
+        self.assertFalse(hiSet.highlighters['Term'].termsLoaded)
+        self.assertEqual(hiSet.highlighters['Term'].terms, [])
+        h = hiSet.getHighlighter('Term')
+        self.assertTrue(h.termsLoaded)
+        self.assertTrue(h.containsTerm('Miskatonic University'))
+
+    def test_cache(self):
+        h = HighlighterSet(self.TESTDIR).getHighlighter('Term')
+        # Unchanged files aren't read again
+        self.assertIs(HighlighterSet(self.TESTDIR).getHighlighter('Term'), h)
+        # Changed files are
+        with open(self.TERM_FILE, 'a') as f:
+            f.write('Orne Library\n')
+        h2 = HighlighterSet(self.TESTDIR).getHighlighter('Term')
+        self.assertIsNot(h2, h)
+        self.assertTrue(h2.containsTerm('Orne Library'))
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
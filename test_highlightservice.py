@@ -0,0 +1,87 @@
+from HighlightService import *
+import tempfile
+import time
+import urllib.request
+import urllib.error
+import unittest
+
+class TestHighlightService(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.PROJECT = os.path.join(self.directory.name, 'project')
+        os.mkdir(self.PROJECT)
+        self.HIGHLIGHTER = os.path.join(self.PROJECT, 'Resource.hil')
+        self.write(self.HIGHLIGHTER, 'Resource\nblack\norange\nbooks\nlibrary\n')
+        highlighterCache.clear()
+        self.server = HighlightServer(self.directory.name, port=0, jobs=1)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        self.directory.cleanup()
+
+    def write(self, fname, text):
+        with open(fname, 'w') as f:
+            f.write(text)
+        # Make sure the modification time changes, even on file systems with coarse timestamps
+        st = os.stat(fname)
+        os.utime(fname, ns=(st.st_atime_ns, time.time_ns() + 10 ** 9))
+
+    def request(self, method, path, body=None):
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        request = urllib.request.Request(self.server.url + path, data=data, method=method)
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, json.loads(response.read().decode('utf-8'))
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read().decode('utf-8'))
+
+    def highlight(self, documents, **options):
+        return self.request('POST', '/highlight', {'project': 'project', 'documents': documents, 'options': options})
+
+    def test_highlight(self):
+        status, reply = self.highlight(['The library lends books.', {'id': 'b', 'text': 'No books'}])
+        self.assertEqual(status, 200)
+        self.assertEqual([r['id'] for r in reply['results']], [0, 'b'])
+        self.assertEqual(reply['results'][0]['matches'],
+                         [{'highlighter': 'Resource', 'term': 'library', 'start': 4, 'end': 11},
+                          {'highlighter': 'Resource', 'term': 'books', 'start': 18, 'end': 23}])
+        self.assertEqual(self.request('GET', '/projects'), (200, {'projects': {'project': ['Resource']}}))
+
+    def test_projectsUseHeaderNames(self):
+        self.highlight(['The Librarian'])
+        self.assertEqual(self.request('GET', '/projects'), (200, {'projects': {'project': ['Resource']}}))
+        # A new highlighter changes the project's signature, so the names are read again
+        self.write(os.path.join(self.PROJECT, 'people.hil'), 'Person\nwhite\nblue\nLibrarian\n')
+        status, reply = self.highlight(['The Librarian'])
+        self.assertEqual([m['highlighter'] for m in reply['results'][0]['matches']], ['Person'])
+        self.assertEqual(self.request('GET', '/projects'), (200, {'projects': {'project': ['Person', 'Resource']}}))
+
+    def test_editedHighlighterIsRecompiled(self):
+        self.highlight(['maps and books'])
+        self.write(self.HIGHLIGHTER, 'Resource\nblack\norange\nmaps\n')
+        status, reply = self.highlight(['maps and books'])
+        self.assertEqual([m['term'] for m in reply['results'][0]['matches']], ['maps'])
+
+    def test_errors(self):
+        self.assertEqual(self.request('GET', '/health'), (200, {'status': 'ok'}))
+        self.assertEqual(self.request('GET', '/missing')[0], 404)
+        self.assertEqual(self.request('POST', '/highlight', {'project': '..', 'documents': []})[0], 404)
+        self.assertEqual(self.highlight([42])[0], 400)
+        self.assertEqual(self.highlight('Miskatonic')[0], 400)
+        self.assertEqual(self.request('POST', '/highlight', {'project': 'project', 'documents': [], 'options': [1]})[0], 400)
+
+    def test_workerPool(self):
+        service = HighlightService(self.directory.name, jobs=2)
+        try:
+            reply = service.highlight({'project': 'project', 'documents': ['books'] * (DOCUMENTS_PER_TASK * 2 + 1)})
+        finally:
+            service.close()
+        self.assertEqual(len(reply['results']), DOCUMENTS_PER_TASK * 2 + 1)
+        self.assertTrue(all(r['matches'][0]['term'] == 'books' for r in reply['results']))
+
+if __name__ == "__main__":
+    unittest.main()
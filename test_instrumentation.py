@@ -0,0 +1,61 @@
+from Instrumentation import *
+import pstats
+import tempfile
+import unittest
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        self.enabled = instruments.enabled
+        instruments.enabled = True
+        instruments.reset()
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        instruments.enabled = self.enabled
+        instruments.reset()
+        self.directory.cleanup()
+
+    def test_timer(self):
+        timer = Timer('t')
+        for ms in (0.05, 3, 3, 700):
+            timer.record(ms / 1000)
+        self.assertEqual(timer.count, 4)
+        self.assertEqual(timer.quantile(0.5), 0.005)
+        self.assertEqual(timer.quantile(1), 1.0)
+        self.assertEqual(timer.asDict()['histogram']['5'], 2)
+
+    def test_timedAndCounters(self):
+        @timed('outer')
+        def outer(n):
+            instruments.increment('items', n)
+            return inner(n) + 1
+
+        @timed('inner')
+        def inner(n):
+            return n
+
+        self.assertEqual(outer(3), 4)
+        instruments.enabled = False
+        self.assertEqual(outer(3), 4)  # Not recorded
+        data = instruments.asDict()
+        self.assertEqual(data['timers']['outer']['count'], 1)
+        self.assertEqual(data['timers']['inner']['count'], 1)
+        self.assertEqual(data['counters'], {'items': 3})
+        fname = os.path.join(self.directory.name, 'timings.json')
+        instruments.dump(fname)
+        with open(fname) as f:
+            self.assertEqual(json.load(f)['counters'], {'items': 3})
+
+    def test_profileNextAction(self):
+        @timed('action')
+        def action():
+            return sum(range(1000))
+
+        fname = os.path.join(self.directory.name, 'action.prof')
+        instruments.profileNextAction(fname)
+        action()
+        self.assertIsNone(instruments.profileFname)  # Only one action is profiled
+        self.assertTrue(any(name == 'action' for (f, line, name) in pstats.Stats(fname).stats))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+from NLTKWordAnalysis import *
+import tempfile
+import unittest
+
+class TestNLTKWordAnalysis(unittest.TestCase):
+    def setUp(self):
+        self.RECORD = WordRecord(singular='dog', plural='dogs', numSynsets=1, synonyms=['dog', 'domestic_dog'],
+                                 hypernyms=['canine'], hyponyms=['puppy'], definition='a domesticated canid',
+                                 definitions=['dog: a domesticated canid'], allSynonyms=['dog', 'domestic_dog'],
+                                 allHypernyms=['canine'], allHyponyms=['puppy'])
+        self.cache = WordAnalysisCache()
+        self.cache.put('dog', self.RECORD)
+
+    def test_flatten(self):
+        self.assertEqual(flatten([1, [2, [3, []], 4], [[5]]]), [1, 2, 3, 4, 5])
+        self.assertEqual(flatten('a'), ['a'])
+        # Neither long nor deeply nested lists are a problem
+        self.assertEqual(len(flatten([[i] for i in range(100000)])), 100000)
+        deep = []
+        for i in range(10000):
+            deep = [deep, i]
+        self.assertEqual(flatten(deep), list(range(10000)))
+
+    def test_wordRecord(self):
+        self.assertEqual(self.RECORD.synonyms, ('dog', 'domestic_dog'))
+        self.assertFalse(hasattr(self.RECORD, '__dict__'))
+        # The record is shared by every context of the word, so it mustn't keep the tag of one of them
+        self.assertNotIn('pos', WordRecord.FIELDS)
+        self.assertEqual(WordRecord.fromDict(self.RECORD.asDict()).asDict(), self.RECORD.asDict())
+
+    def test_persistence(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = WordAnalysisCache(directory)
+            cache.put('dog', self.RECORD)
+            cache.close()
+            cache = WordAnalysisCache(directory)
+            self.assertEqual(cache.lookup('dog').asDict(), self.RECORD.asDict())
+            cache.close()
+
+    def test_analyzedWords(self):
+        analyzedWords = AnalyzedWords(['dog', 'dog', 'dog'], ['NN', 'NN', 'VB'], self.cache)
+        self.assertEqual([aw.plural for aw in analyzedWords], ['dogs'] * 3)
+        # It can be iterated again, and repeats share their analysis
+        self.assertEqual([aw.pos for aw in analyzedWords], ['Noun, singular or mass', 'Noun, singular or mass', 'Verb, base form'])
+        self.assertIs(analyzedWords[0], analyzedWords[1])
+        self.assertIs(analyzedWords[0].analysis, analyzedWords[2].analysis)
+        self.assertEqual(len(analyzedWords.unique()), 2)
+        self.assertEqual(len(analyzedWords), 3)
+
+if __name__ == "__main__":
+    unittest.main()
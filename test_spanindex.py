@@ -0,0 +1,24 @@
+from SpanIndex import *
+import unittest
+
+class TestSpanIndex(unittest.TestCase):
+    def setUp(self):
+        self.SPANS = [(0, 10), (5, 8), (20, 41), (30, 35), (50, 55)]
+
+    def test_overlapping(self):
+        index = SpanIndex(reversed(self.SPANS))
+        self.assertEqual(index.overlapping(9, 31), [(0, 10), (20, 41), (30, 35)])
+        self.assertEqual(index.overlapping(40, 50), [(20, 41)])
+        self.assertEqual(index.overlapping(41, 50), [])
+        self.assertEqual(index.overlapping(0, float('inf')), self.SPANS)
+
+    def test_addAndRemove(self):
+        index = SpanIndex(self.SPANS[:2])
+        index.addSpans(self.SPANS[2:])
+        self.assertEqual(list(index), self.SPANS)
+        index.removeSpans([(20, 41), (99, 100)])
+        self.assertEqual(len(index), 4)
+        self.assertEqual(index.overlapping(36, 45), [])
+
+if __name__ == "__main__":
+    unittest.main()
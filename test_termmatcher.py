@@ -0,0 +1,86 @@
+from TermMatcher import *
+import unittest
+
+class TestTermMatcher(unittest.TestCase):
+    def setUp(self):
+        self.TEXT = 'The Orne Library of Miskatonic University\nholds books at Miskatonic.'
+        self.TERMS = ['Miskatonic University', 'Miskatonic', 'books', 'Library', 'missing']
+
+    # What successive Text.search calls find for a single term
+    def searchAll(self, text, term):
+        spans = []
+        i = text.find(term)
+        while i != -1:
+            spans.append((i, i + len(term)))
+            i = text.find(term, i + len(term))
+        return spans
+
+    def test_findAll(self):
+        spans = TermMatcher(self.TERMS).findAll(self.TEXT)
+        for term in self.TERMS:
+            self.assertEqual(spans[term], self.searchAll(self.TEXT, term))
+
+    def test_overlappingTerms(self):
+        spans = TermMatcher(['aa', 'a']).findAll('aaaa')
+        # Matches of the same term don't overlap, just like Text.search from the previous match end
+        self.assertEqual(spans['aa'], [(0, 2), (2, 4)])
+        self.assertEqual(spans['a'], [(0, 1), (1, 2), (2, 3), (3, 4)])
+
+    def test_emptyAndDuplicateTerms(self):
+        matcher = TermMatcher(['', 'books', 'books'])
+        self.assertEqual(matcher.terms, ['books'])
+        self.assertEqual(matcher.findAll(self.TEXT), {'books': [(48, 53)]})
+
+    def test_variants(self):
+        variants = {'book': ['book', 'books'], 'library': ['library', 'libraries']}
+        matcher = TermMatcher(['book', 'library'], variants=lambda t: variants[t], foldCase=True)
+        spans = matcher.findAll('Books, a BOOK and LIBRARIES; bookbooks')
+        # The longest variant wins, and case is ignored
+        self.assertEqual(spans['book'], [(0, 5), (9, 13), (29, 33), (33, 38)])
+        self.assertEqual(spans['library'], [(18, 27)])
+
+    def test_findTerm(self):
+        for term in self.TERMS:
+            self.assertEqual(findTerm(self.TEXT, term), TermMatcher([term]).findAll(self.TEXT)[term])
+        self.assertEqual(findTerm('aaaaa', 'aa'), [(0, 2), (2, 4)])
+        self.assertEqual(findTerm(self.TEXT, ''), [])
+
+    def test_earlierVariantOverlappingLastMatch(self):
+        # 'bQcdeR' starts before the held back 'cde', but overlaps the 'ab' already matched, so 'cde' is kept
+        matcher = TermMatcher(['ab'], variants=lambda t: ['ab', 'cde', 'bQcdeR'])
+        self.assertEqual(matcher.findAll('..abQcdeR')['ab'], [(2, 4), (5, 8)])
+
+    def test_longerVariantAfterLaterMatch(self):
+        # 'b' at 1 doesn't overlap 'b' at 0, but 'bba' from 0 is longer and wins
+        matcher = TermMatcher(['b'], variants=lambda t: ('b', 'bba'))
+        self.assertEqual(matcher.findAll('bba')['b'], [(0, 3)])
+        self.assertEqual(matcher.findAll('bbab b')['b'], [(0, 3), (3, 4), (5, 6)])
+
+    def test_foldCase(self):
+        text = 'İstanbul Books'
+        spans = TermMatcher(['books'], foldCase=True).findAll(text)
+        self.assertEqual(spans['books'], [(9, 14)])
+
+    def test_highlighterMatcher(self):
+        matcher = HighlighterMatcher({'Term': ['Miskatonic University', 'books'], 'Resource': ['books']})
+        spans = matcher.findAll(self.TEXT)
+        self.assertEqual(spans['Term']['Miskatonic University'], self.searchAll(self.TEXT, 'Miskatonic University'))
+        self.assertEqual(spans['Term']['books'], spans['Resource']['books'])
+        self.assertEqual(list(spans['Resource'].keys()), ['books'])
+
+    def test_highlighterMatcherWholeWords(self):
+        tokenize = lambda text: text.replace('.', ' .').split()
+        matcher = HighlighterMatcher({'Term': ['Miskatonic', 'book']}, wholeWords=True, tokenize=tokenize)
+        spans = matcher.findAll(self.TEXT)
+        self.assertEqual(spans['Term']['Miskatonic'], [(20, 30), (57, 67)])
+        self.assertEqual(spans['Term']['book'], [])
+
+    def test_lineIndex(self):
+        lineIndex = LineIndex(self.TEXT)
+        start = self.TEXT.index('books')
+        self.assertEqual(lineIndex.index(0), '1.0')
+        self.assertEqual(lineIndex.index(start), '2.6')
+        self.assertEqual(lineIndex.offset('2.6'), start)
+
+if __name__ == "__main__":
+    unittest.main()
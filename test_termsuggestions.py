@@ -0,0 +1,37 @@
+from TermSuggestions import *
+from Highlighter import Highlighter
+from unittest import mock
+import re
+import unittest
+
+RELATED = {'book': [('book', 'synonym'), ('volume', 'synonym'), ('publication', 'hypernym')],
+           'library': [('depository library', 'hyponym'), ('publication', 'hyponym'), ('book', 'hyponym')]}
+
+class TestTermSuggestions(unittest.TestCase):
+    def setUp(self):
+        self.highlighter = Highlighter('Test.hil', load=False)
+        self.highlighter.addTerms(['book', 'library'])
+
+    # WordNet is replaced by a fixed table, so only the merging and ranking are tested
+    @mock.patch('TermSuggestions.relatedWords', lambda term: RELATED[term])
+    def test_suggestRelatedTerms(self):
+        text = 'A Volume, a volume and a Publication.'
+        suggestions = suggestRelatedTerms(self.highlighter, text, threads=2, matcherOptions={'foldCase': True})
+        self.assertEqual([(s.word, s.count) for s in suggestions],
+                         [('volume', 2), ('publication', 1), ('depository library', 0)])
+        # Candidates found from several terms keep every reason, and terms it already has are left out
+        self.assertEqual(suggestions[1].reasons, ['hypernym of book', 'hyponym of library'])
+
+    # Counted as they would be highlighted, so in whole word mode 'book' isn't counted in 'bookshop'
+    @mock.patch('TermSuggestions.relatedWords', lambda term: [('bookshop', 'hyponym'), ('book', 'synonym')]
+                if term == 'library' else [])
+    def test_matcherOptions(self):
+        self.highlighter.removeTerm('book')
+        text = 'A book from the bookshop.'
+        counts = lambda options: [(s.word, s.count) for s in suggestRelatedTerms(self.highlighter, text, 2, options)]
+        self.assertEqual(counts(None), [('book', 2), ('bookshop', 1)])
+        tokenize = lambda text: re.findall(r"\w+|[^\w\s]", text)
+        self.assertEqual(counts({'wholeWords': True, 'tokenize': tokenize}), [('book', 1), ('bookshop', 1)])
+
+if __name__ == "__main__":
+    unittest.main()
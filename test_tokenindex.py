@@ -0,0 +1,59 @@
+from TokenIndex import *
+import re
+import unittest
+
+def tokenize(text):
+    return re.findall(r"\w+|[^\w\s]", text)
+
+class TestTokenIndex(unittest.TestCase):
+    def setUp(self):
+        self.TEXT = 'Art fairs start at the party.\nThe art of the Art Gallery, and modern art.'
+
+    def test_offsets(self):
+        index = TokenIndex(self.TEXT, tokenize)
+        for token, start, end in zip(index.tokens, index.starts, index.ends):
+            self.assertEqual(self.TEXT[start:end], token)
+
+    def test_quotes(self):
+        # word_tokenize writes double quotes as `` and ''
+        index = TokenIndex('He said "art".', lambda text: ['He', 'said', '``', 'art', "''", '.'])
+        self.assertEqual(list(zip(index.starts, index.ends)), [(0, 2), (3, 7), (8, 9), (9, 12), (12, 13), (13, 14)])
+
+    def test_wholeWords(self):
+        matcher = TokenMatcher(['art', 'Art Gallery', 'modern art', 'missing'], tokenize=tokenize)
+        spans = matcher.findAll(TokenIndex(self.TEXT, tokenize))
+        # Not inside "start" or "party", nor "Art", and terms of several words are matched as token sequences
+        self.assertEqual([self.TEXT[s:e] for s, e in spans['art']], ['art', 'art'])
+        self.assertEqual([self.TEXT[s:e] for s, e in spans['Art Gallery']], ['Art Gallery'])
+        self.assertEqual([self.TEXT[s:e] for s, e in spans['modern art']], ['modern art'])
+        self.assertEqual(spans['missing'], [])
+
+    def test_termAtEndOfText(self):
+        # 'modern art' starts with the same token as 'art', which ends the text
+        spans = TokenMatcher(['art', 'modern art'], tokenize=tokenize).findAll('I like art')
+        self.assertEqual(spans, {'art': [(7, 10)], 'modern art': []})
+        spans = TokenMatcher(['art', 'art fair'], tokenize=tokenize).findAll('I like art')
+        self.assertEqual(spans, {'art': [(7, 10)], 'art fair': []})
+
+    def test_variantsAndCase(self):
+        variants = {'art': ['art', 'arts'], 'fair': ['fair', 'fairs']}
+        matcher = TokenMatcher(['art', 'fair'], variants=lambda t: variants[t], foldCase=True, tokenize=tokenize)
+        spans = matcher.findAll(self.TEXT)
+        self.assertEqual(len(spans['art']), 4)
+        self.assertEqual([self.TEXT[s:e] for s, e in spans['fair']], ['fairs'])
+
+    def test_chunkMatches(self):
+        text = 'Art fairs start.\n\nThe art of the Art\n\nGallery, and modern\n\n\nart.\n\nart'
+        matcher = TokenMatcher(['art', 'Art Gallery', 'modern art', 'Art'], tokenize=tokenize)
+        expected = sorted(matcher.iterMatches(text))
+        for size in (1, 2, 5, 7, len(text)):
+            chunks = [text[i:i + size] for i in range(0, len(text), size)]
+            self.assertEqual(sorted(matcher.iterChunkMatches(chunks)), expected)
+            # Nothing generated after a mark starts before it
+            mark = 0
+            for start, end, term in matcher.iterChunkMatches(chunks, markChunks=True):
+                self.assertGreaterEqual(start, mark)
+                if term is None: mark = start
+
+if __name__ == "__main__":
+    unittest.main()